@@ -7,28 +7,34 @@ E-mail      :   jasonleaster@163.com
 """
 
 from config import TEST_IMG
-from matplotlib import image
+from config import DETECT_MAX_SIDE
+from config import DETECT_MIN_FACE
 from matplotlib import pyplot
 import pylab
 from time import time
 from detector import Detector
+from image    import loadForDetection
 
 start_time = time()
 
-img = image.imread(TEST_IMG)
-
-if len(img.shape) == 3:
-    imgSingleChannel = img[:,:, 1]
-else:
-    imgSingleChannel = img
+# shrunk while decoding, the rectangles are mapped back to original image
+imgSingleChannel, scale = loadForDetection(TEST_IMG,
+                                           maxSide = DETECT_MAX_SIDE,
+                                           minFace = DETECT_MIN_FACE)
 
 det = Detector()
 
-rectangles = det.scanImgOverScale(imgSingleChannel)
+found      = det.scanImgOverScale(imgSingleChannel)
+rectangles = det.mapRectangles(found, scale)
 
 end_time = time()
 
 print("Number of rectangles: ", len(rectangles))
 print("Cost time: ", end_time - start_time)
 
-det.showResult(img, rectangles)
+print("Rectangles in the original image:")
+for rectangle in rectangles:
+    print(rectangle)
+
+# drawn on the shrunk image, the original one is never decoded
+det.showResult(imgSingleChannel.copy(), found)
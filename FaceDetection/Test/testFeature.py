@@ -0,0 +1,110 @@
+"""
+File        :   testFeature.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Stress test of Haar feature evaluation. Many threads share a single
+@Feature object and their results must be the same as the serial ones.
+The rectangle sums read from the integral image are checked against the
+sums of the pixels.
+
+    python ./Test/testFeature.py
+"""
+import os
+import sys
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from config      import TRAINING_IMG_WIDTH
+from config      import TRAINING_IMG_HEIGHT
+from haarFeature import Feature
+from image       import Image
+from image       import normalizeStack
+from image       import vecImgStack
+
+FACE_DIR    = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                           "..", "TrainingImages", "FACES")
+THREAD_NUM  = 8
+IMAGE_NUM   = 32
+
+
+class TestFeatureThreads(unittest.TestCase):
+
+    def setUp(self):
+        fileList = sorted(os.listdir(FACE_DIR))[:IMAGE_NUM]
+
+        self.images = [Image(os.path.join(FACE_DIR, name), +1) for name in fileList]
+        self.haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
+
+        self.serial = self.haar.calFeatureForImgs(self.images)
+
+    def test_calFeatureForImg(self):
+        # the returned vectors must not be overwritten by later calls
+        with ThreadPoolExecutor(THREAD_NUM) as pool:
+            vectors = list(pool.map(self.haar.calFeatureForImg, self.images))
+
+        for i in range(IMAGE_NUM):
+            self.assertTrue(numpy.allclose(vectors[i], self.serial[:, i], atol = 1e-5))
+
+    def test_calFeatureForImgs(self):
+        # every batch of 4 images is computed 4 times concurrently
+        starts = [i for _ in range(4) for i in range(0, IMAGE_NUM, 4)]
+
+        def work(i):
+            return self.haar.calFeatureForImgs(self.images[i:i + 4], chunkSize = 2)
+
+        with ThreadPoolExecutor(THREAD_NUM) as pool:
+            mats = list(pool.map(work, starts))
+
+        for i, mat in zip(starts, mats):
+            self.assertTrue(numpy.array_equal(mat, self.serial[:, i:i + 4]))
+
+    def test_calSelectedFeatures(self):
+        rng  = numpy.random.RandomState(0)
+        dims = [rng.choice(self.haar.featuresNum, 50, replace = False)
+                for _ in range(THREAD_NUM * 4)]
+
+        def work(d):
+            return self.haar.calSelectedFeatures(d, self.images)
+
+        with ThreadPoolExecutor(THREAD_NUM) as pool:
+            mats = list(pool.map(work, dims))
+
+        for d, mat in zip(dims, mats):
+            self.assertTrue(numpy.allclose(mat, self.serial[d], atol = 1e-5))
+
+
+class TestRectSum(unittest.TestCase):
+
+    def setUp(self):
+        rng = numpy.random.RandomState(0)
+
+        stack       = rng.randint(0, 256, (1, TRAINING_IMG_HEIGHT, TRAINING_IMG_WIDTH))
+        self.pixels = normalizeStack(stack)[0]
+        self.vecImg = vecImgStack(stack)[0]
+        self.haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
+
+    def test_rectSum(self):
+        for x, y, width, height in [(0, 0, 1, 1), (0, 0, 3, 5), (0, 0, 7, 2),
+                                    (0, 4, 3, 5), (6, 0, 2, 3), (5, 7, 4, 6)]:
+            expected = self.pixels[y:y + height, x:x + width].sum()
+            self.assertAlmostEqual(self.haar.rectSum(self.vecImg, x, y, width, height), expected)
+
+    def test_originCorner(self):
+        # the old index of the corner of a rectangle at (0, 0) was
+        # width * height + 2, it's not the bottom right pixel
+        width, height = 3, 5
+        expected = self.pixels[:height, :width].sum()
+
+        self.assertNotAlmostEqual(self.vecImg[width * height + 2], expected)
+        self.assertAlmostEqual(self.vecImg[TRAINING_IMG_HEIGHT * (width - 1) + height - 1], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -25,10 +25,23 @@ from config import EXPECTED_TPR
 from config import EXPECTED_FPR
 
 from config import ROC_FILE
+from config import STUMP_PROCESS_NUM
+from config import WEIGHT_TRIM
+from config import WEIGHT_SAMPLE
+from config import WEIGHT_SAMPLE_SEED
+from config import WEIGHT_SUBSET_MAX_RATIO
 
 from weakClassifier import WeakClassifier
+from weakClassifier import presort
+from weakClassifier import removeOrder
+from parallelStump  import StumpPool
 from matplotlib     import pyplot
 from haarFeature    import Feature
+from haarFeature    import CatalogPolicy
+from featureSampler import FeatureSampler
+from quantization   import FeatureBins
+from roc            import ROC
+from compactModel   import CompactModel
 
 import numpy
 import time
@@ -36,10 +49,20 @@ import pylab
 import math
 
 
-def getCachedAdaBoost(mat = None, label = None, filename = "", limit = 0):
+# the first line of model file, followed by the key of catalog policy
+MODEL_POLICY_TAG = "policy "
+
+# type of the scores of the strong classifier, see CompactModel.grade
+SCORE_TYPE = numpy.float32
+
+
+def getCachedAdaBoost(mat = None, label = None, filename = "", limit = 0, policy = None):
     """
         Construct a AdaBoost object with cached data
-        from file @ADABOOST_FILE """
+        from file @ADABOOST_FILE
+
+        If @policy is given, raise ValueError when the model was trained
+        with features of another catalog policy."""
 
     #fileObj = open(filename, "a+")
     fileObj = open(filename)
@@ -47,11 +70,23 @@ def getCachedAdaBoost(mat = None, label = None, filename = "", limit = 0):
     print("Constructing AdaBoost from existed model data")
 
     tmp = fileObj.readlines()
+
+    # model files without policy line were trained with the full catalog
+    cachedPolicy = CatalogPolicy()
+    if len(tmp) > 0 and tmp[0].startswith(MODEL_POLICY_TAG):
+        cachedPolicy = CatalogPolicy.fromKey(tmp[0][len(MODEL_POLICY_TAG):])
+        tmp = tmp[1:]
+
     if len(tmp) == 0:
         raise ValueError("There is no cached AdaBoost model")
 
+    if policy is not None and policy != cachedPolicy:
+        raise ValueError("model " + filename + " was trained with catalog " +
+                         "policy " + cachedPolicy.key() + ", expected " +
+                         policy.key())
+
     weakerNum = len(tmp) / 4
-    model     = AdaBoost(train = False, limit = weakerNum)
+    model     = AdaBoost(train = False, limit = weakerNum, policy = cachedPolicy)
 
     if limit < weakerNum:
         model.weakerLimit = limit
@@ -74,11 +109,6 @@ def getCachedAdaBoost(mat = None, label = None, filename = "", limit = 0):
 
         classifier = model.Weaker(train = False)
         classifier.constructor(dimension, direction, threshold)
-        classifier._mat = mat
-        classifier._label = label
-
-        if mat is not None:
-            classifier.sampleNum = mat.shape[1]
         #print('i=', i)
         model.G[int(i/4)]     = classifier
         model.alpha[int(i/4)] = alpha
@@ -104,16 +134,42 @@ class AdaBoost:
         @Mat    :   A matrix(or two dimension array) which's size is
                     (row    = number of features,
                     column  = number of total sample)
+                    or a FeatureSampler, which trains each round on a
+                    subset of features computed on the fly.
         @Tag    :   A vector(or one dimension array) which's size is the
                     same as the number of total sample
         @classifier: Object. A instance of weaker classifier.
 
         @train  :   A bool value. If it's False, it means that user want to
                     get a instance of this class object from cached data
-        @limit  :   A integer. The limitation of training times."""
-
+        @limit  :   A integer. The limitation of training times.
+        @policy :   The CatalogPolicy of the features in @Mat. It's saved
+                    with the model. None means the default policy.
+        @featureIndex:
+                    If @Mat only holds some rows of the full feature
+                    matrix (see featureSelection.py), row i of @Mat is the
+                    feature featureIndex[i] of the catalog. The saved model
+                    always references the catalog dimensions.
+        @quantizer: If @Mat is quantized (see quantization.py), the Quantizer
+                    or FeatureBins of its rows. The weak classifiers are
+                    trained on the quantized values (over the bins for
+                    FeatureBins), and their thresholds are converted back
+                    to float when the model is saved.
+        @validMat:  The feature matrix of held out samples, with the same
+                    rows as @Mat (quantized the same way). Their scores
+                    are updated every round like the training scores, and
+                    the accuracy and the rates are recorded in
+                    @validAccuracy, @validTpr and @validFpr.
+        @validTag:  The labels of the held out samples."""
+
+
+    def __init__(self, Mat = None, Tag = None, classifier = WeakClassifier, train = True, limit = 4,
+                 policy = None, featureIndex = None, quantizer = None,
+                 validMat = None, validTag = None):
+        # the score of every training sample with the weak classifiers
+        # trained so far, see @_boost
+        self.score = None
 
-    def __init__(self, Mat = None, Tag = None, classifier = WeakClassifier, train = True, limit = 4):
         if train == True:
             self._mat   = Mat
             self._label = Tag
@@ -133,6 +189,32 @@ class AdaBoost:
             self.W = numpy.array(pos_W + neg_W)
 
             self.accuracy = []
+            # seconds spent in each round and the number of samples its
+            # stump was searched on, see @_boost. @roundFallback is True
+            # for a round which should search the trimmed (drawn) samples
+            # but searched all of them, see @roundSamples
+            self.roundTimes     = []
+            self.roundSampleNum = []
+            self.roundFallback  = []
+
+            self.score = numpy.zeros(self.samplesNum, dtype = SCORE_TYPE)
+
+            self.validMat   = validMat
+            self.validLabel = validTag
+            self.validScore = None
+            if validMat is not None:
+                assert validMat.shape[1] == validTag.size
+                self.validScore = numpy.zeros(validTag.size, dtype = SCORE_TYPE)
+
+            self.validAccuracy = []
+            self.validTpr      = 0.
+            self.validFpr      = 0.
+
+        if policy is None:
+            policy = CatalogPolicy.default()
+        self.policy = policy
+        self.featureIndex = featureIndex
+        self.quantizer    = quantizer
 
         self.Weaker = classifier
         limit = math.floor(limit)
@@ -152,57 +234,197 @@ class AdaBoost:
         self.th  = 0.
 
 
+    def confusion(self, output, label = None):
+        """
+            The rates (tpr, fpr) of the predicted labels @output of the
+        samples labeled @label, the training samples by default."""
+
+        if label is None:
+            label = self._label
+
+        positive = label == LABEL_POSITIVE
+        predictP = output == LABEL_POSITIVE
+
+        Num_tp = numpy.count_nonzero(positive & predictP)  # Number of true positive
+        Num_fn = numpy.count_nonzero(positive & ~predictP) # Number of false negative
+        Num_fp = numpy.count_nonzero(~positive & predictP) # Number of false positive
+        Num_tn = numpy.count_nonzero(~positive & ~predictP)# Number of true negative
+
+        tpr = Num_tp * 1./(Num_tp + Num_fn)
+        fpr = Num_fp * 1./(Num_tn + Num_fp)
+
+        return tpr, fpr
+
+
     def is_good_enough(self):
 
-        output = self.prediction(self._mat, self.th)
+        output = self.classify(self.score, self.th)
 
         correct = numpy.count_nonzero(output == self._label)/(self.samplesNum*1.)
         self.accuracy.append( correct)
 
         self.detectionRate = numpy.count_nonzero(output[0:self.posNum] == LABEL_POSITIVE) * 1./ self.posNum
 
-        Num_tp = 0 # Number of true positive
-        Num_fn = 0 # Number of false negative
-        Num_tn = 0 # Number of true negative
-        Num_fp = 0 # Number of false positive
-        for i in range(self.samplesNum):
-            if self._label[i] == LABEL_POSITIVE:
-                if output[i] == LABEL_POSITIVE:
-                    Num_tp += 1
-                else:
-                    Num_fn += 1
-            else:
-                if output[i] == LABEL_POSITIVE:
-                    Num_fp += 1
-                else:
-                    Num_tn += 1
-
-        self.tpr = Num_tp * 1./(Num_tp + Num_fn)
-        self.fpr = Num_fp * 1./(Num_tn + Num_fp)
+        self.tpr, self.fpr = self.confusion(output)
 
         if self.tpr > EXPECTED_TPR and self.fpr < EXPECTED_FPR:
             return True
 
-    def train(self):
+    def train(self, processNum = STUMP_PROCESS_NUM, trim = WEIGHT_TRIM,
+              sampleSize = WEIGHT_SAMPLE):
         """
         function @train() is the main process which run
-        AdaBoost algorithm."""
+        AdaBoost algorithm.
+
+        @processNum :   Number of processes searching the stumps, see
+                        parallelStump.py. 1 means searching in this
+                        process, None means the number of CPUs.
+        @trim       :   If it's greater than 0, the stump of each round is
+                        searched only on the heaviest samples which hold
+                        1 - @trim of the weight (weight trimming).
+        @sampleSize :   If it's greater than 0 (and @trim is 0), the stump
+                        of each round is searched on this number of
+                        samples drawn by weight.
+
+            With @trim or @sampleSize, the error and the weights are still
+        updated on all samples. A stump which is useless on all samples
+        is searched again on all of them."""
 
         adaboost_start_time = time.time()
 
+        # sorted once, reused by the weak classifiers of all rounds
+        order, binNum = None, None
+        if isinstance(self.quantizer, FeatureBins):
+            binNum = self.quantizer.binNum
+        elif not isinstance(self._mat, FeatureSampler):
+            order = presort(self._mat)
+
+        stumpPool = None
+        if processNum != 1 and not isinstance(self._mat, FeatureSampler):
+            # the features are searched in shards by a pool of processes
+            stumpPool = StumpPool(self._mat, self._label, order, binNum, processNum)
+
+        self._random = numpy.random.RandomState(WEIGHT_SAMPLE_SEED)
+
+        try:
+            self._boost(order, binNum, stumpPool, trim, sampleSize)
+        finally:
+            if stumpPool is not None:
+                stumpPool.close()
+            removeOrder(order)
+
+        #self.showErrRates()
+        #self.showROC()
+
+        print("The time cost of training this AdaBoost model:",\
+                time.time() - adaboost_start_time)
+
+        output = self.classify(self.score, self.th)
+        return output, self.fpr
+
+
+    def roundSamples(self, trim, sampleSize):
+        """
+            The samples the stump of this round is searched on, and their
+        weights. (None, @self.W) means all samples, see @train. It's also
+        returned when the subset is more than WEIGHT_SUBSET_MAX_RATIO of
+        the samples, e.g. the first rounds of a small @trim, before the
+        weights concentrate on a few samples."""
+
+        if trim > 0:
+            # the heaviest samples which hold 1 - trim of the weight
+            heavy = numpy.argsort(-self.W, kind = "stable")
+            num   = numpy.searchsorted(numpy.cumsum(self.W[heavy]), (1 - trim) * self.W.sum()) + 1
+
+            samples = numpy.sort(heavy[:min(num, self.samplesNum)])
+            weight  = self.W[samples]
+
+        elif sampleSize > 0:
+            # drawn by weight, a sample drawn k times weighs k
+            drawn = self._random.choice(self.samplesNum, sampleSize, p = self.W / self.W.sum())
+
+            samples, count = numpy.unique(drawn, return_counts = True)
+            weight  = count / float(sampleSize)
+
+        else:
+            return None, self.W
+
+        if len(samples) > WEIGHT_SUBSET_MAX_RATIO * self.samplesNum:
+            # taking the columns would cost more than it saves
+            return None, self.W
+
+        return samples, weight
+
+
+    def _searchStump(self, m, order, binNum, stumpPool, samples, weight):
+        # the best stump of the m-th round on @samples, see @roundSamples.
+        # Return (weak classifier, its error on @samples)
+
+        label = self._label if samples is None else self._label[samples]
+
+        if isinstance(self._mat, FeatureSampler):
+            # the best stump among the features sampled for this round
+            dims = self._mat.sample(m)
+
+            weaker = self.Weaker(self._mat.features(dims, samples), label, weight)
+            errorRate = weaker.search()
+
+            weaker.opt_dimension = int(dims[weaker.opt_dimension])
+        elif stumpPool is not None:
+            errorRate, dimension, threshold, direction = stumpPool.search(weight, samples)
+
+            weaker = self.Weaker(train = False)
+            weaker.constructor(dimension, direction, threshold)
+        else:
+            weaker = self.Weaker(self._mat, label, weight, order = order,
+                                 binNum = binNum, samples = samples)
+            errorRate = weaker.search()
+
+        # only the stump is kept, not the matrix and the weights which
+        # it was searched on
+        stump = self.Weaker(train = False)
+        stump.constructor(weaker.opt_dimension, weaker.opt_direction, weaker.opt_threshold)
+        stump.opt_errorRate = errorRate
+
+        return stump, errorRate
+
+
+    def _boost(self, order, binNum, stumpPool, trim, sampleSize):
+        # the rounds of boosting, see @train
+
         for m in range(self.weakerLimit):
             self.N += 1
 
-            if DEBUG_MODEL == True:
-                weaker_start_time = time.time()
+            weaker_start_time = time.time()
+
+            samples, weight = self.roundSamples(trim, sampleSize)
 
-            self.G[m] = self.Weaker(self._mat, self._label, self.W)
-            
-            errorRate = self.G[m].train()
+            self.G[m], errorRate = self._searchStump(m, order, binNum, stumpPool,
+                                                     samples, weight)
+
+            search_time = time.time() - weaker_start_time
+
+            output = self.G[m].prediction(self._mat)
+
+            if samples is not None:
+                # the error on all samples, not only the searched ones
+                errorRate = self.W[output != self._label].sum()
+
+                if errorRate >= 0.5:
+                    samples = None
+                    self.G[m], errorRate = self._searchStump(m, order, binNum, stumpPool,
+                                                             samples, self.W)
+                    output = self.G[m].prediction(self._mat)
+
+            assert errorRate < 0.5
+
+            self.roundSampleNum.append(self.samplesNum if samples is None else len(samples))
+            self.roundFallback.append((trim > 0 or sampleSize > 0) and samples is None)
 
             if DEBUG_MODEL == True:
-                print("Time for training WeakClassifier:", \
-                        time.time() - weaker_start_time)
+                print("Time for training WeakClassifier:", search_time)
+                if self.roundFallback[-1]:
+                    print("The stump was searched on all samples, not a subset")
 
             if errorRate < 0.0001:
                 errorRate = 0.0001
@@ -210,19 +432,30 @@ class AdaBoost:
             beta = errorRate / (1 - errorRate)
             self.alpha[m] = numpy.log(1/beta)
 
-            output = self.G[m].prediction(self._mat)
+            #self.W *= numpy.exp(-self.alpha[m] * self._label * output)
+            self.W[self._label == output] *= beta
+
+            # summed in order as the builtin sum did, numpy.sum adds
+            # pairwise and would change the weights in the last bits
+            self.W /= numpy.cumsum(self.W)[-1]
 
-            for i in range(self.samplesNum):
-                #self.W[i] *= numpy.exp(-self.alpha[m] * self._label[i] * output[i])
-                if self._label[i] == output[i]:
-                    self.W[i] *=  beta
+            # only the new weak classifier is added to the scores. It's
+            # the sum @grade computes, up to the rounding of float32
+            self.score += output * self.alpha[m]
 
-            self.W /= sum(self.W)
+            if self.validScore is not None:
+                self.validate(m)
 
             if USING_CASCADE is True:
                 self.th, self.detectionRate = self.findThreshold(EXPECTED_TPR)
 
-            if self.is_good_enough():
+            enough = self.is_good_enough()
+
+            # (stump search, everything else) of this round
+            self.roundTimes.append((search_time,
+                                    time.time() - weaker_start_time - search_time))
+
+            if enough:
                 print ((self.N) ," weak classifier is enough to ",)
                 print ("meet the request which given by user.")
                 print ("Training Done :)")
@@ -235,38 +468,118 @@ class AdaBoost:
                 print ("detectionRate :", self.detectionRate)
                 print ("AdaBoost's Th :", self.th)
                 print ("alpha         :", self.alpha[m])
+                if self.validScore is not None:
+                    print ("validation    :", self.validAccuracy[-1])
 
-        #self.showErrRates()
-        #self.showROC()
 
-        print("The time cost of training this AdaBoost model:",\
-                time.time() - adaboost_start_time)
+    def validate(self, m):
+        """
+            Add the m-th weak classifier to the scores of the held out
+        samples, and record their accuracy and rates with the current
+        threshold."""
 
-        output = self.prediction(self._mat, self.th)
-        return output, self.fpr
+        self.validScore += self.G[m].prediction(self.validMat) * self.alpha[m]
 
+        output = self.classify(self.validScore, self.th)
 
-    def grade(self, Mat):
+        self.validAccuracy.append(numpy.count_nonzero(output == self.validLabel) * 1. /
+                                  self.validLabel.size)
 
-        #Mat = numpy.array(Mat)
+        self.validTpr, self.validFpr = self.confusion(output, self.validLabel)
+
+
+    def catalogDimension(self, m):
+        """
+            The dimension in the feature catalog of the m-th weak
+        classifier."""
+
+        if self.featureIndex is None:
+            return self.G[m].opt_dimension
+        return int(self.featureIndex[self.G[m].opt_dimension])
+
+
+    def threshold(self, m):
+        """
+            The threshold of the m-th weak classifier on float features."""
+
+        if self.quantizer is None:
+            return self.G[m].opt_threshold
+        return self.quantizer.toFloat(self.G[m].opt_dimension, self.G[m].opt_threshold)
+
+
+    def selectedFeatures(self):
+        """
+            The sorted feature dimensions which are used by this model.
+        Pass it to @Feature.calSelectedFeatures to compute the compact
+        feature matrix for @grade and @prediction. They are catalog
+        dimensions, see @catalogDimension."""
+
+        return self.compact(catalog = True).selectedFeatures()
+
+
+    def remapDimensions(self, dims):
+        """
+            The row of each weak classifier's dimension in a compact
+        matrix which only holds the catalog features @dims."""
+
+        return self.compact(catalog = True).remapDimensions(dims)
+
+
+    def compact(self, catalog = False):
+        """
+            The first @N weak classifiers as a CompactModel, parallel
+        arrays of their alpha, dimension, direction and threshold.
+
+        @catalog    :   If False, the dimensions and thresholds are those
+                        of the training matrix, like @G. If True, they are
+                        catalog dimensions and float thresholds (see
+                        @catalogDimension and @threshold), like the saved
+                        model, for features computed by @Feature."""
+
+        if catalog is True:
+            dimension = [self.catalogDimension(n) for n in range(self.N)]
+            threshold = [self.threshold(n)        for n in range(self.N)]
+        else:
+            dimension = [self.G[n].opt_dimension  for n in range(self.N)]
+            threshold = [self.G[n].opt_threshold  for n in range(self.N)]
+
+        return CompactModel([self.alpha[n]           for n in range(self.N)],
+                            dimension,
+                            [self.G[n].opt_direction for n in range(self.N)],
+                            threshold)
+
+
+    def grade(self, Mat, dims = None):
+        """
+        @Mat    :   The feature matrix. If @dims is None, it's like the
+                    training matrix (the same rows and feature type).
+                    Else it only holds the float features @dims of the
+                    catalog, e.g. @selectedFeatures.
 
-        sampleNum = Mat.shape[1]
+        Return the float32 scores, see CompactModel.grade."""
 
-        output = numpy.zeros(sampleNum, dtype = numpy.float16)
+        model = self.compact(catalog = dims is not None)
 
-        for i in range(self.N):
-            output += self.G[i].prediction(Mat) * self.alpha[i]
+        rows = None
+        if dims is not None:
+            rows = model.remapDimensions(dims)
 
-        return output
+        return model.grade(Mat, rows)
 
 
-    def prediction(self, Mat, th = None):
+    def prediction(self, Mat, th = None, dims = None):
 
         #Mat = numpy.array(Mat)
 
-        output = self.grade(Mat)
-            
-        if th == None:
+        return self.classify(self.grade(Mat, dims), th)
+
+
+    def classify(self, output, th = None):
+        """
+            The labels of the scores @output (see @grade) with the
+        threshold @th, @self.th by default."""
+
+        if th is None:
             th = self.th
 
         """
@@ -275,53 +588,40 @@ class AdaBoost:
         output[output <= th] = LABEL_NEGATIVE
         """
 
-        for i in range(len(output)):
-            if output[i] > th:
-                output[i] = LABEL_POSITIVE
-            else:
-                output[i] = LABEL_NEGATIVE
-
-        return output
+        # one comparison, then the labels
+        return numpy.where(output > th, LABEL_POSITIVE, LABEL_NEGATIVE).astype(output.dtype)
 
 
-    def findThreshold(self, expected_tpr):
-        detectionRate = 0.
-        best_th       = None
+    def trainingScore(self):
+        """
+            The scores of the training samples, the cached ones during
+        training."""
 
-        low_bound = -sum(self.alpha)
-        up__bound = +sum(self.alpha)
-        step      = -0.1
-        threshold = numpy.arange(up__bound - step, low_bound + step, step)
+        if self.score is None:
+            self.score = self.grade(self._mat)
+        return self.score
 
-        for t in range(threshold.size):
 
-            output = self.prediction(self._mat, threshold[t])
+    def roc(self, score = None, label = None):
+        """
+            The ROC curve (see roc.py) of the scores @score of the samples
+        labeled @label, the training samples by default. Pass the
+        validation scores (@validScore, @validLabel) or the scores of a
+        test set (@grade) for held out samples."""
 
-            Num_tp = 0 # Number of true positive
-            Num_fn = 0 # Number of false negative
-            Num_tn = 0 # Number of true negative
-            Num_fp = 0 # Number of false positive
-            for i in range(self.samplesNum):
-                if self._label[i] == LABEL_POSITIVE:
-                    if output[i] == LABEL_POSITIVE:
-                        Num_tp += 1
-                    else:
-                        Num_fn += 1
-                else:
-                    if output[i] == LABEL_POSITIVE:
-                        Num_fp += 1
-                    else:
-                        Num_tn += 1
+        if score is None:
+            score, label = self.trainingScore(), self._label
 
-            tpr = Num_tp * 1./(Num_tp + Num_fn)
-            fpr = Num_fp * 1./(Num_tn + Num_fp)
+        return ROC(score, label)
 
-            if tpr >= expected_tpr:
 
-                detectionRate = numpy.count_nonzero(output[0:self.posNum] == LABEL_POSITIVE) * 1./ self.posNum
+    def findThreshold(self, expected_tpr, score = None, label = None):
+        """
+            The threshold with the lowest fpr which detects at least
+        @expected_tpr of the positive samples, and the detection rate
+        with it."""
 
-                best_th = threshold[t]
-                break
+        best_th, detectionRate, fpr = self.roc(score, label).threshold(expected_tpr)
 
         return best_th, detectionRate
 
@@ -340,59 +640,15 @@ class AdaBoost:
         else:
             pyplot.savefig("accuracyflow.jpg")
 
-    def showROC(self):
-        best_tpr = 0.
-        best_fpr = 1.
-        best_th  = None
-
-        low_bound = -sum(self.alpha) * 0.5
-        up__bound = +sum(self.alpha) * 0.5
-        step      = 0.1
-        threshold = numpy.arange(low_bound, up__bound, step)
-
-        tprs      = numpy.zeros(threshold.size, dtype = numpy.float16)
-        fprs      = numpy.zeros(threshold.size, dtype = numpy.float16)
-
-        for t in range(threshold.size):
-
-            output = self.prediction(self._mat, threshold[t])
-
-            Num_tp = 0 # Number of true positive
-            Num_fn = 0 # Number of false negative
-            Num_tn = 0 # Number of true negative
-            Num_fp = 0 # Number of false positive
-            for i in range(self.samplesNum):
-                if self._label[i] == LABEL_POSITIVE:
-                    if output[i] == LABEL_POSITIVE:
-                        Num_tp += 1
-                    else:
-                        Num_fn += 1
-                else:
-                    if output[i] == LABEL_POSITIVE:
-                        Num_fp += 1
-                    else:
-                        Num_tn += 1
-
-            tpr = Num_tp * 1./(Num_tp + Num_fn)
-            fpr = Num_fp * 1./(Num_tn + Num_fp)
-
-            # if tpr >= best_tpr and fpr <= best_fpr:
-            #     best_tpr = tpr
-            #     best_fpr = fpr
-            #     best_th  = threshold[t]
-
-            tprs[t] = tpr
-            fprs[t] = fpr
-
-        fileObj = open(ROC_FILE, "a+")
-        for t, f, th in zip(tprs, fprs, threshold):
-            fileObj.write(str(t) + "\t" + str(f) + "\t" + str(th) + "\n")
+    def showROC(self, score = None, label = None):
+        """
+            Append the ROC curve (see @roc) to @ROC_FILE and plot it."""
 
-        fileObj.flush()
-        fileObj.close()
+        roc = self.roc(score, label)
+        roc.save(ROC_FILE)
 
         pyplot.title("The ROC curve")
-        pyplot.plot(fprs, tprs, "-r", linewidth = 1)
+        pyplot.plot(roc.fprs, roc.tprs, "-r", linewidth = 1)
         pyplot.xlabel("fpr")
         pyplot.ylabel("tpr")
         pyplot.axis([-0.02, 1.1, 0, 1.1])
@@ -408,11 +664,15 @@ class AdaBoost:
         """
         fileObj = open(filename, "a+")
 
+        # a new model file starts with the catalog policy
+        if fileObj.tell() == 0:
+            fileObj.write(MODEL_POLICY_TAG + self.policy.key() + "\n")
+
         for m in range(self.N):
             fileObj.write(str(self.alpha[m]) + "\n")
-            fileObj.write(str(self.G[m].opt_dimension) + "\n")
+            fileObj.write(str(self.catalogDimension(m)) + "\n")
             fileObj.write(str(self.G[m].opt_direction) + "\n")
-            fileObj.write(str(self.G[m].opt_threshold) + "\n")
+            fileObj.write(str(self.threshold(m)) + "\n")
 
         fileObj.flush()
         fileObj.close()
@@ -433,13 +693,13 @@ class AdaBoost:
         IMG_WIDTH  = TRAINING_IMG_WIDTH
         IMG_HEIGHT = TRAINING_IMG_HEIGHT
 
-        haar = Feature(IMG_WIDTH, IMG_HEIGHT)
+        haar = Feature(IMG_WIDTH, IMG_HEIGHT, self.policy)
 
         featuresAll = haar.features
         selFeatures = [] # selected features
 
         for n in range(self.N):
-            selFeatures.append(featuresAll[self.G[n].opt_dimension])
+            selFeatures.append(featuresAll[self.catalogDimension(n)])
 
         classifierPic = numpy.zeros((IMG_HEIGHT, IMG_WIDTH))
 
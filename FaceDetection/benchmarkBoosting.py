@@ -0,0 +1,141 @@
+"""
+File        :   benchmarkBoosting.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Report the time spent outside the stump search in each round of
+AdaBoost (updating the weights, predicting, counting the rates), see
+@AdaBoost.roundTimes.
+
+    The second table is a microbenchmark of the same bookkeeping on
+random scores of LOOP_SAMPLES samples, the old per sample Python loops
+against the array operations which replaced them.
+
+    python ./benchmarkBoosting.py
+"""
+
+from config import TEST_FACE
+from config import TEST_NONFACE
+from config import TRAINING_IMG_HEIGHT
+from config import TRAINING_IMG_WIDTH
+from config import LABEL_POSITIVE
+from config import LABEL_NEGATIVE
+
+from haarFeature import Feature
+from adaboost    import AdaBoost
+from image       import ImageSet
+
+import numpy
+import time
+
+SAMPLE_FACE    = 400
+SAMPLE_NONFACE = 800
+WEAK_LIMIT     = 10
+
+# number of samples of the microbenchmark, about our training set
+LOOP_SAMPLES   = 13800
+LOOP_REPEAT    = 5
+
+
+def loopWeights(W, label, output, beta):
+    for i in range(len(W)):
+        if label[i] == output[i]:
+            W[i] *= beta
+    W /= sum(W)
+
+
+def arrayWeights(W, label, output, beta):
+    W[label == output] *= beta
+    W /= numpy.cumsum(W)[-1]
+
+
+def loopPrediction(score, th):
+    output = score.copy()
+    for i in range(len(output)):
+        if output[i] > th:
+            output[i] = LABEL_POSITIVE
+        else:
+            output[i] = LABEL_NEGATIVE
+    return output
+
+
+def arrayPrediction(score, th):
+    return numpy.where(score > th, LABEL_POSITIVE, LABEL_NEGATIVE).astype(score.dtype)
+
+
+def loopRates(label, output):
+    Num_tp, Num_fn, Num_tn, Num_fp = 0, 0, 0, 0
+    for i in range(len(label)):
+        if label[i] == LABEL_POSITIVE:
+            if output[i] == LABEL_POSITIVE:
+                Num_tp += 1
+            else:
+                Num_fn += 1
+        else:
+            if output[i] == LABEL_POSITIVE:
+                Num_fp += 1
+            else:
+                Num_tn += 1
+    return Num_tp * 1./(Num_tp + Num_fn), Num_fp * 1./(Num_tn + Num_fp)
+
+
+def arrayRates(label, output):
+    positive = label == LABEL_POSITIVE
+    predictP = output == LABEL_POSITIVE
+    tp = numpy.count_nonzero(positive & predictP)
+    fp = numpy.count_nonzero(~positive & predictP)
+    return tp * 1./numpy.count_nonzero(positive), fp * 1./numpy.count_nonzero(~positive)
+
+
+def timeIt(function, *args):
+    start = time.time()
+    for i in range(LOOP_REPEAT):
+        result = function(*args)
+    return (time.time() - start) / LOOP_REPEAT, result
+
+
+face    = ImageSet(TEST_FACE,    sampleNum = SAMPLE_FACE)
+nonFace = ImageSet(TEST_NONFACE, sampleNum = SAMPLE_NONFACE)
+
+images = face.images + nonFace.images
+label  = numpy.array([LABEL_POSITIVE for i in range(face.sampleNum)] +
+                     [LABEL_NEGATIVE for i in range(nonFace.sampleNum)])
+
+haar = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
+mat  = haar.calFeatureForImgs(images)
+
+model = AdaBoost(mat, label, limit = WEAK_LIMIT)
+model.train()
+
+print("%-6s %12s %12s %8s" % ("round", "stump s", "other s", "other %"))
+for n, (search, other) in enumerate(model.roundTimes):
+    print("%-6d %12.4f %12.4f %8.1f" % (n, search, other, 100. * other / (search + other)))
+
+
+random = numpy.random.RandomState(0)
+
+posNum = LOOP_SAMPLES // 4
+label  = numpy.array([LABEL_POSITIVE] * posNum + [LABEL_NEGATIVE] * (LOOP_SAMPLES - posNum))
+score  = random.randn(LOOP_SAMPLES).astype(numpy.float16)
+stump  = numpy.where(random.rand(LOOP_SAMPLES) < 0.7, label, -label)
+W      = numpy.ones(LOOP_SAMPLES) / LOOP_SAMPLES
+
+print()
+print("%-12s %12s %12s %8s %10s" % ("per round", "loop ms", "array ms", "speedup", "identical"))
+
+for name, loop, array, args in [("weights",    loopWeights,    arrayWeights,    (label, stump, 0.4)),
+                                ("prediction", loopPrediction, arrayPrediction, (score, 0.1)),
+                                ("rates",      loopRates,      arrayRates,      (label, stump))]:
+    if name == "weights":
+        loopW, arrayW = W.copy(), W.copy()
+        loopTime,  _ = timeIt(loop,  loopW,  *args)
+        arrayTime, _ = timeIt(array, arrayW, *args)
+        same = numpy.array_equal(loopW, arrayW)
+    else:
+        loopTime,  loopResult  = timeIt(loop,  *args)
+        arrayTime, arrayResult = timeIt(array, *args)
+        same = numpy.array_equal(loopResult, arrayResult)
+
+    print("%-12s %12.3f %12.3f %8.1f %10s" % (name, loopTime * 1000, arrayTime * 1000,
+                                              loopTime / arrayTime, same))
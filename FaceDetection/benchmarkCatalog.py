@@ -0,0 +1,69 @@
+"""
+File        :   benchmarkCatalog.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Compare the Haar feature catalog policies. For each policy it reports
+the number of features, the size of feature matrix, the time cost of
+extracting features and training AdaBoost, and the accuracy on a held
+out part of the samples.
+
+    python ./benchmarkCatalog.py
+"""
+
+from config import TRAINING_IMG_HEIGHT
+from config import TRAINING_IMG_WIDTH
+from config import HAAR_FEATURE_TYPE_I
+from config import HAAR_FEATURE_TYPE_II
+from config import HAAR_FEATURE_TYPE_III
+from config import HAAR_FEATURE_TYPE_IV
+
+from haarFeature import Feature
+from haarFeature import CatalogPolicy
+from adaboost    import AdaBoost
+from benchmarkSamples import loadSamples
+
+import numpy
+import time
+
+SAMPLE_FACE    = 400
+SAMPLE_NONFACE = 800
+# ratio of samples used for training, the rest for testing
+TRAIN_RATIO    = 0.75
+WEAK_LIMIT     = 10
+
+POLICIES = [CatalogPolicy(),
+            CatalogPolicy(stride = 2),
+            CatalogPolicy(stride = 2, minSize = 2),
+            CatalogPolicy(stride = 3, minSize = 2, maxSize = 6),
+            CatalogPolicy(types = (HAAR_FEATURE_TYPE_I,   HAAR_FEATURE_TYPE_II,
+                                   HAAR_FEATURE_TYPE_III, HAAR_FEATURE_TYPE_IV))]
+
+trainImages, trainLabel, testImages, testLabel = loadSamples(SAMPLE_FACE, SAMPLE_NONFACE,
+                                                            TRAIN_RATIO)
+
+results = []
+for policy in POLICIES:
+    haar = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT, policy)
+
+    start = time.time()
+    mat   = haar.calFeatureForImgs(trainImages)
+    extractTime = time.time() - start
+
+    start = time.time()
+    model = AdaBoost(mat, trainLabel, limit = WEAK_LIMIT, policy = policy)
+    model.train()
+    trainTime = time.time() - start
+
+    dims   = model.selectedFeatures()
+    output = model.prediction(haar.calSelectedFeatures(dims, testImages), dims = dims)
+    accuracy = numpy.count_nonzero(output == testLabel) * 1. / testLabel.size
+
+    results.append((policy.key(), haar.featuresNum, mat.nbytes / 2.**20,
+                    extractTime, trainTime, accuracy))
+
+print("%-45s %9s %10s %10s %10s %9s" % ("policy", "features", "matrix MB",
+                                         "extract s", "train s", "accuracy"))
+for result in results:
+    print("%-45s %9d %10.1f %10.2f %10.2f %9.3f" % result)
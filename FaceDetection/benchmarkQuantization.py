@@ -0,0 +1,82 @@
+"""
+File        :   benchmarkQuantization.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Report the accuracy drift of training on quantized feature matrices
+(see quantization.py) against float32. For each type it reports the
+size of feature matrix, the time cost of training AdaBoost, how many
+weak classifiers picked the same feature as the float32 model, and the
+accuracy on a held out part of the samples. The held out samples use
+float features and the saved (float) thresholds, like the detector.
+
+    python ./benchmarkQuantization.py
+"""
+
+from config import TRAINING_IMG_HEIGHT
+from config import TRAINING_IMG_WIDTH
+
+from haarFeature  import Feature
+from adaboost     import AdaBoost
+from adaboost     import getCachedAdaBoost
+from benchmarkSamples import loadSamples
+from quantization import Quantizer
+
+import numpy
+import os
+import tempfile
+import time
+
+SAMPLE_FACE    = 400
+SAMPLE_NONFACE = 800
+# ratio of samples used for training, the rest for testing
+TRAIN_RATIO    = 0.75
+WEAK_LIMIT     = 10
+
+TYPES = [None, "float16", "int16", "uint8"]
+
+trainImages, trainLabel, testImages, testLabel = loadSamples(SAMPLE_FACE, SAMPLE_NONFACE,
+                                                            TRAIN_RATIO)
+
+haar     = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
+floatMat = haar.calFeatureForImgs(trainImages)
+testMat  = haar.calFeatureForImgs(testImages)
+
+results   = []
+floatDims = None
+for dtype in TYPES:
+    if dtype is None:
+        mat, quantizer = floatMat, None
+    else:
+        quantizer = Quantizer.fit(floatMat, dtype)
+        mat       = quantizer.quantize(floatMat)
+
+    start = time.time()
+    model = AdaBoost(mat, trainLabel, limit = WEAK_LIMIT, quantizer = quantizer)
+    model.train()
+    trainTime = time.time() - start
+
+    # the saved model, thresholds converted back to float
+    with tempfile.TemporaryDirectory() as modelDir:
+        modelFile = os.path.join(modelDir, "model")
+        model.saveModel(modelFile)
+        model = getCachedAdaBoost(filename = modelFile, limit = WEAK_LIMIT)
+
+    dims = [model.G[n].opt_dimension for n in range(model.N)]
+    if floatDims is None:
+        floatDims = dims
+    same = sum(1 for d, f in zip(dims, floatDims) if d == f)
+
+    output   = model.prediction(testMat, th = 0)
+    accuracy = numpy.count_nonzero(output == testLabel) * 1. / testLabel.size
+
+    results.append((dtype or "float32", mat.nbytes / 2.**20, trainTime,
+                    "%d/%d" % (same, len(floatDims)), accuracy))
+
+floatAccuracy = results[0][-1]
+
+print("%-10s %10s %10s %14s %9s %9s" % ("type", "matrix MB", "train s",
+                                         "same features", "accuracy", "drift"))
+for result in results:
+    print("%-10s %10.1f %10.2f %14s %9.3f %+9.3f" % (result + (result[-1] - floatAccuracy,)))
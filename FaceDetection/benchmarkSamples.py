@@ -0,0 +1,43 @@
+"""
+File        :   benchmarkSamples.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    The samples of the benchmarks, the test faces and non-faces split
+into a training part and a held out part.
+"""
+
+from config import TEST_FACE
+from config import TEST_NONFACE
+from config import LABEL_POSITIVE
+from config import LABEL_NEGATIVE
+
+from image import ImageSet
+
+import numpy
+
+
+def loadSamples(faceNum, nonFaceNum, trainRatio):
+    """
+        Load @faceNum faces and @nonFaceNum non-faces, the first
+    @trainRatio of each is used for training, the rest for testing.
+
+    Return (trainImages, trainLabel, testImages, testLabel), the
+    positive samples first as AdaBoost expects.
+    """
+    face    = ImageSet(TEST_FACE,    sampleNum = faceNum)
+    nonFace = ImageSet(TEST_NONFACE, sampleNum = nonFaceNum)
+
+    posTrain = int(face.sampleNum    * trainRatio)
+    negTrain = int(nonFace.sampleNum * trainRatio)
+
+    trainImages = face.images[:posTrain] + nonFace.images[:negTrain]
+    testImages  = face.images[posTrain:] + nonFace.images[negTrain:]
+
+    trainLabel = numpy.array([LABEL_POSITIVE for i in range(posTrain)] +
+                             [LABEL_NEGATIVE for i in range(negTrain)])
+    testLabel  = numpy.array([LABEL_POSITIVE for i in range(face.sampleNum    - posTrain)] +
+                             [LABEL_NEGATIVE for i in range(nonFace.sampleNum - negTrain)])
+
+    return trainImages, trainLabel, testImages, testLabel
@@ -0,0 +1,79 @@
+"""
+File        :   benchmarkTrimming.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Report the effect of weight trimming and of sampling by weight (see
+@AdaBoost.train) against searching every stump on all samples. For each
+setting it prints the time of the stump search and the number of samples
+searched in every round (marked "all" when a trimmed or sampled round
+fell back to all samples, see @AdaBoost.roundSamples), then the speedup
+of the stump search, the number of such rounds and the accuracy on the
+training samples and on a held out part of the samples.
+
+    python ./benchmarkTrimming.py
+"""
+
+from config import TRAINING_IMG_HEIGHT
+from config import TRAINING_IMG_WIDTH
+
+from haarFeature import Feature
+from adaboost    import AdaBoost
+from benchmarkSamples import loadSamples
+
+import numpy
+
+SAMPLE_FACE    = 400
+SAMPLE_NONFACE = 800
+# ratio of samples used for training, the rest for testing
+TRAIN_RATIO    = 0.75
+WEAK_LIMIT     = 20
+
+# (name, trim, sampleSize)
+SETTINGS = [("all",         0.,   0),
+            ("trim 0.01",   0.01, 0),
+            ("trim 0.05",   0.05, 0),
+            ("trim 0.10",   0.10, 0),
+            ("sample 25%",  0.,   -4),
+            ("sample 10%",  0.,   -10)]
+
+trainImages, trainLabel, testImages, testLabel = loadSamples(SAMPLE_FACE, SAMPLE_NONFACE,
+                                                            TRAIN_RATIO)
+
+haar     = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
+trainMat = haar.calFeatureForImgs(trainImages)
+testMat  = haar.calFeatureForImgs(testImages)
+
+results = []
+for name, trim, sampleSize in SETTINGS:
+    if sampleSize < 0:
+        # a fraction of the training samples
+        sampleSize = trainLabel.size // -sampleSize
+
+    model = AdaBoost(trainMat, trainLabel, limit = WEAK_LIMIT,
+                     validMat = testMat, validTag = testLabel)
+    model.train(trim = trim, sampleSize = sampleSize)
+
+    searchTime = numpy.array([search for (search, other) in model.roundTimes])
+
+    results.append((name, searchTime, model.roundSampleNum, model.roundFallback,
+                    model.accuracy[-1], model.validAccuracy[-1]))
+
+for name, searchTime, sampleNum, fallback, trainAccuracy, testAccuracy in results:
+    print()
+    print(name)
+    print("%-6s %10s %10s %8s" % ("round", "stump s", "samples", "speedup"))
+    for n in range(len(searchTime)):
+        speedup = results[0][1][n] / searchTime[n] if n < len(results[0][1]) else numpy.nan
+        print("%-6d %10.4f %10d %8.2f %s" % (n, searchTime[n], sampleNum[n], speedup,
+                                             "all" if fallback[n] else ""))
+
+print()
+print("%-12s %8s %12s %12s %8s %9s %9s %9s" % ("setting", "rounds", "stump s/rnd", "samples/rnd",
+                                               "speedup", "all rnds", "train acc", "test acc"))
+for name, searchTime, sampleNum, fallback, trainAccuracy, testAccuracy in results:
+    print("%-12s %8d %12.4f %12.0f %8.2f %9d %9.3f %9.3f" %
+          (name, len(searchTime), searchTime.mean(), numpy.mean(sampleNum),
+           results[0][1].mean() / searchTime.mean(), sum(fallback),
+           trainAccuracy, testAccuracy))
@@ -14,12 +14,18 @@ from config   import NEGATIVE_SAMPLE
 from config   import TRAINING_IMG_HEIGHT
 from config   import TRAINING_IMG_WIDTH
 from config   import FEATURE_FILE_TRAINING
-from config   import FEATURE_NUM
 from config   import ADABOOST_LIMIT
 from config   import ADABOOST_CACHE_FILE
 from config   import DEBUG_MODEL
+from config   import TRAINING_PACK
+from config   import LABEL_POSITIVE
+from config   import LABEL_NEGATIVE
+from config   import FEATURE_CACHE_DIR
 
 from haarFeature import Feature
+from haarFeature import FeatureStore
+from haarFeature import loadFeatureMat
+from featureCache import FeatureCache
 from image       import ImageSet
 from adaboost    import AdaBoost
 from adaboost    import getCachedAdaBoost
@@ -33,8 +39,12 @@ class Cascade:
     def __init__(self, face_dir = "", nonface_dir = "", train = True, limit = 30):
         #tot_samples = 0
 
-        self.Face    = ImageSet(face_dir,    sampleNum = POSITIVE_SAMPLE)
-        self.nonFace = ImageSet(nonface_dir, sampleNum = NEGATIVE_SAMPLE)
+        # the packed training set needs no decoding, see dataset.py
+        if os.path.isfile(TRAINING_PACK):
+            face_dir, nonface_dir = TRAINING_PACK, TRAINING_PACK
+
+        self.Face    = ImageSet(face_dir,    LABEL_POSITIVE, sampleNum = POSITIVE_SAMPLE, lazy = True)
+        self.nonFace = ImageSet(nonface_dir, LABEL_NEGATIVE, sampleNum = NEGATIVE_SAMPLE, lazy = True)
 
         tot_samples = self.Face.sampleNum + self.nonFace.sampleNum
 
@@ -42,36 +52,36 @@ class Cascade:
 
         self.haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
 
-        if os.path.isfile(FEATURE_FILE_TRAINING + ".npy"):
+        # memory mapped, the training reads it by blocks of FEATURE_BLOCK_SIZE rows
+        if FEATURE_CACHE_DIR is not None:
 
-            self._mat = numpy.load(FEATURE_FILE_TRAINING + ".npy")
+            self._mat = FeatureCache(FEATURE_CACHE_DIR, self.haar).trainingMat(
+                            FEATURE_FILE_TRAINING, (self.Face, self.nonFace))
 
-        else:
-            if DEBUG_MODEL is True:
-                self._mat = numpy.zeros((self.haar.featuresNum, tot_samples))
+        elif os.path.isfile(FEATURE_FILE_TRAINING + ".npy"):
 
-                for i in range(self.Face.sampleNum):
-                    featureVec = self.haar.calFeatureForImg(self.Face.images[i])
-                    for j in range(self.haar.featuresNum):
-                        self._mat[j][i                     ]  = featureVec[j]
+            self._mat = loadFeatureMat(FEATURE_FILE_TRAINING, self.haar.policy, mmap_mode = "r")
 
-                for i in range(self.nonFace.sampleNum):
-                    featureVec = self.haar.calFeatureForImg(self.nonFace.images[i])
-                    for j in range(self.haar.featuresNum):
-                        self._mat[j][i + self.Face.sampleNum] = featureVec[j]
+        else:
+            if DEBUG_MODEL is True:
+                store = FeatureStore(FEATURE_FILE_TRAINING, self.haar.featuresNum,
+                                     tot_samples, self.haar.policy)
+                self.haar.calFeatureForImgSets((self.Face, self.nonFace), out = store.mat)
 
-                numpy.save(FEATURE_FILE_TRAINING, self._mat)
+                self._mat = store.close()
             else:
-                from mapReduce import map
-                from mapReduce import reduce
+                from parallelFeature import extractFeatures
+
+                store = FeatureStore(FEATURE_FILE_TRAINING, self.haar.featuresNum,
+                                     tot_samples, self.haar.policy)
+                extractFeatures(self.haar, (self.Face, self.nonFace), store.mat)
 
-                map(self.Face, self.nonFace)
-                self._mat = reduce()
+                self._mat = store.close()
 
         featureNum, sampleNum = self._mat.shape
 
         assert sampleNum  == (POSITIVE_SAMPLE + NEGATIVE_SAMPLE)
-        assert featureNum == FEATURE_NUM
+        assert featureNum == self.haar.featuresNum
 
         Label_Face    = [+1 for i in range(POSITIVE_SAMPLE)]
         Label_NonFace = [-1 for i in range(NEGATIVE_SAMPLE)]
@@ -106,9 +116,11 @@ class Cascade:
                     self.strong_classifier[i] = getCachedAdaBoost(mat     = self._mat,
                                                                   label   = self._label,
                                                                   filename= cache_filename,
-                                                                  limit   = ADABOOST_LIMIT)
+                                                                  limit   = ADABOOST_LIMIT,
+                                                                  policy  = self.haar.policy)
                 else:
-                    self.strong_classifier[i] = AdaBoost(mat, label, limit = ADABOOST_LIMIT)
+                    self.strong_classifier[i] = AdaBoost(mat, label, limit = ADABOOST_LIMIT,
+                                                         policy = self.haar.policy)
                     output, fpr = self.strong_classifier[i].train()
 
                     cur_fpr *= fpr
@@ -127,12 +139,14 @@ class Cascade:
 
         assert len(output) == self._label.size
 
-        _mat = numpy.zeros((FEATURE_NUM, POSITIVE_SAMPLE + fp_num), dtype=numpy.float16)
+        featureNum = self.haar.featuresNum
+
+        _mat = numpy.zeros((featureNum, POSITIVE_SAMPLE + fp_num), dtype=numpy.float16)
 
         _mat[:, :POSITIVE_SAMPLE] = mat[:, :POSITIVE_SAMPLE]
         """
         for i in xrange(POSITIVE_SAMPLE):
-            for j in xrange(FEATURE_NUM):
+            for j in xrange(featureNum):
                 mat[j][i] = self._mat[j][i]
         """
 
@@ -140,7 +154,7 @@ class Cascade:
         # only reserve negative samples which are classified wrong
         for i in range(POSITIVE_SAMPLE, self._label.size):
             if output[i] != self._label[i]:
-                for j in range(FEATURE_NUM):
+                for j in range(featureNum):
                     _mat[j][POSITIVE_SAMPLE + counter] = mat[j][i]
                 counter += 1
 
@@ -0,0 +1,110 @@
+"""
+File        :   compactModel.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    A trained AdaBoost model as parallel arrays, one entry per weak
+classifier (decision stump):
+
+        @alpha          float32, the weight of the stump
+        @dimension      the row of the feature matrix it looks at
+        @direction      int8, +1 or -1
+        @threshold      float64, the threshold
+
+    @grade scores all samples with one gather of the selected feature
+rows, one comparison and one weighted sum (a matrix-vector product) in
+float32, instead of a prediction array per stump.
+
+    Float32 (and float16, integer) features are compared with float32
+thresholds. Each threshold is rounded toward its direction, so the
+comparison gives the same answer as the float64 threshold would.
+"""
+
+from config import LABEL_POSITIVE
+from config import LABEL_NEGATIVE
+
+import numpy
+
+
+class CompactModel:
+
+    def __init__(self, alpha, dimension, direction, threshold):
+        self.alpha     = numpy.asarray(alpha,     dtype = numpy.float32)
+        self.dimension = numpy.asarray(dimension, dtype = numpy.intp)
+        self.direction = numpy.asarray(direction, dtype = numpy.int8)
+        self.threshold = numpy.asarray(threshold, dtype = numpy.float64)
+
+        assert self.alpha.shape == self.dimension.shape == \
+               self.direction.shape == self.threshold.shape
+
+        # a stump predicts positive when direction * feature < bound
+        self._bound64 = self.direction * self.threshold
+
+        # float32 features: feature < t  <=> feature < t rounded up,
+        #                   feature > t  <=> feature > t rounded down
+        threshold32 = self.threshold.astype(numpy.float32)
+
+        up   = (self.direction > 0) & (threshold32 < self.threshold)
+        down = (self.direction < 0) & (threshold32 > self.threshold)
+        threshold32[up]   = numpy.nextafter(threshold32[up],   numpy.float32(numpy.inf))
+        threshold32[down] = numpy.nextafter(threshold32[down], numpy.float32(-numpy.inf))
+
+        self._bound32     = self.direction * threshold32
+        self._direction32 = self.direction.astype(numpy.float32)
+
+
+    def __len__(self):
+        return self.alpha.size
+
+
+    def nbytes(self):
+        return self.alpha.nbytes + self.dimension.nbytes + self.direction.nbytes + \
+               self.threshold.nbytes + self._bound64.nbytes + self._bound32.nbytes + \
+               self._direction32.nbytes
+
+
+    def selectedFeatures(self):
+        """
+            The sorted feature dimensions which are used by this model."""
+        return numpy.unique(self.dimension)
+
+
+    def remapDimensions(self, dims):
+        """
+            The row of each stump's dimension in a compact matrix which
+        only holds the features @dims, e.g. @selectedFeatures."""
+
+        rowOf = {d : row for row, d in enumerate(numpy.asarray(dims).tolist())}
+
+        for d in self.dimension.tolist():
+            if d not in rowOf:
+                raise ValueError("feature " + str(d) + " is not in the selected features")
+
+        return numpy.array([rowOf[d] for d in self.dimension.tolist()], dtype = numpy.intp)
+
+
+    def grade(self, Mat, rows = None):
+        """
+            The float32 scores of the samples (columns) of @Mat.
+
+        @rows   :   The row of @Mat of every stump, see @remapDimensions.
+                    @dimension by default."""
+
+        if rows is None:
+            rows = self.dimension
+
+        feature = numpy.asarray(Mat[rows])
+
+        if feature.dtype == numpy.float64:
+            positive = feature * self.direction[:, None] < self._bound64[:, None]
+        else:
+            positive = feature.astype(numpy.float32, copy = False) * \
+                       self._direction32[:, None] < self._bound32[:, None]
+
+        # the vote of a stump is LABEL_NEGATIVE + positive * (LABEL_POSITIVE
+        # - LABEL_NEGATIVE), so the weighted sum is one product with
+        # @positive
+        return numpy.float32(LABEL_POSITIVE - LABEL_NEGATIVE) * \
+               (self.alpha @ positive.astype(numpy.float32)) + \
+               numpy.float32(LABEL_NEGATIVE) * self.alpha.sum()
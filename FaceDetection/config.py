@@ -17,6 +17,10 @@ USING_CASCADE = False
 TRAINING_FACE    = "/home/wynmew/workspace/FaceDetection/FaceDetection/TrainingImages/FACES/"
 TRAINING_NONFACE = "/home/wynmew/workspace/FaceDetection/FaceDetection/TrainingImages/NFACES/"
 
+# training set packed by dataset.py into a single file. It's used instead of
+# the directories above if it exists.
+TRAINING_PACK    = "./features/training.pack"
+
 # test set directory for face and non-face images
 TEST_FACE        = "./TrainingImages/FACES/"
 TEST_NONFACE     = "./TrainingImages/NFACES/"
@@ -26,13 +30,25 @@ TEST_IMG         = "./Test/nens.png"
 
 FEATURE_FILE_TRAINING = "./features/features_train.cache"
 FEATURE_FILE_TESTING  = "./features/features_test.cache"
+FEATURE_FILE_SELECTED = "./features/features_selected.cache"
+FEATURE_FILE_QUANTIZED= "./features/features_train_quantized.cache"
+FEATURE_FILE_BINNED   = "./features/features_train_binned.cache"
+
+# feature columns cached by image content, only the new images of the
+# training set are computed, see featureCache.py. None disables it
+FEATURE_CACHE_DIR     = "./features/cache"
 
-FEATURE_FILE_SUBSET   = "./features/features_train_subset"
-FEATURE_FILE_SUBSET_0 = "./features/features_train_subset0.cache"
-FEATURE_FILE_SUBSET_1 = "./features/features_train_subset1.cache"
+# compiled Haar feature catalogs, one file for each window size
+CATALOG_FILE          = "./features/haar_catalog"
 
-# For parallel
-PROCESS_NUM = 2
+# For parallel, number of processes computing features (see parallelFeature.py)
+# None means the number of CPUs
+PROCESS_NUM = None
+# number of images a process computes at a time
+PARALLEL_CHUNK_SIZE = 256
+
+# number of threads decoding images in ImageSet, None means number of CPUs
+LOADING_THREAD_NUM = None
 
 ADABOOST_CACHE_FILE = "./model/adaboost_classifier.cache0"
 ROC_FILE            = "./model/roc.cache"
@@ -46,16 +62,71 @@ TRAINING_IMG_WIDTH  = 19
 # How many different types of  Haar-feature
 FEATURE_TYPE_NUM    = 5
 # How many number of features that a single training image have
+# (with the default catalog policy below)
 FEATURE_NUM = 37862
 #FEATURE_NUM         = 16373
 #FEATURE_NUM         = 49608
 
+# number of images computed together by @Feature.calFeatureForImgs
+FEATURE_CHUNK_SIZE = 1024
+
+# number of feature rows processed together when scanning a feature matrix,
+# it bounds the memory used by training from a memory mapped feature file
+FEATURE_BLOCK_SIZE = 4096
+
+# train on the feature matrix quantized to "uint8", "int16" or "float16",
+# see quantization.py. None means training on float32 features
+FEATURE_QUANTIZATION = None
+
+# train on the features bucketed into this number of bins (at most 256),
+# see quantization.FeatureBins. 0 means no binning
+FEATURE_BINS = 0
+
+# matrix-free training, see featureSampler.py. Only the integral images of
+# the samples are kept and every round tries this number of features
+# computed on the fly. 0 means training on the full feature matrix
+MATRIX_FREE_FEATURES = 0
+# "random" or "cyclic" subsets of features
+MATRIX_FREE_SCHEDULE = "random"
+
+# number of features searched together for the best stump, see
+# @WeakClassifier.optimalStumps
+STUMP_BLOCK_SIZE = 256
+
+# number of processes searching the stumps of a round, see parallelStump.py
+# 1 means searching in the training process, None means the number of CPUs
+STUMP_PROCESS_NUM = 1
+
+# search the stump of each round only on the heaviest samples which hold
+# 1 - WEIGHT_TRIM of the weight, see @AdaBoost.train. 0 means all samples.
+# It has no effect until the weights concentrate: while the heaviest
+# samples are more than WEIGHT_SUBSET_MAX_RATIO of them (the first rounds,
+# longer for a small trim) all samples are searched, see
+# @AdaBoost.roundFallback
+WEIGHT_TRIM        = 0.
+# or on this number of samples drawn by weight. 0 means all samples
+WEIGHT_SAMPLE      = 0
+WEIGHT_SAMPLE_SEED = 0
+# a round searches all samples if the trimmed or drawn ones are more than
+# this ratio of them, filtering the presorted samples costs more than
+# the smaller search saves then
+WEIGHT_SUBSET_MAX_RATIO = 0.6
+
+# keep only this number of features before boosting, see featureSelection.py
+# 0 means using all features
+PRESELECT_NUM             = 0
+PRESELECT_MAX_CORRELATION = 0.95
+
 # number of positive and negative sample will be used in the training process
 POSITIVE_SAMPLE     = 4800
 NEGATIVE_SAMPLE     = 9000
 
 SAMPLE_NUM = POSITIVE_SAMPLE + NEGATIVE_SAMPLE
 
+# add the horizontally flipped faces into the training set. Their features
+# are reindexed from the existing feature matrix, see @Feature.mirrorFeatures
+MIRROR_POSITIVE     = False
+
 TESTING_POSITIVE_SAMPLE = 20
 TESTING_NEGATIVE_SAMPLE = 20
 
@@ -84,6 +155,19 @@ HAAR_FEATURE_TYPE_III   = "III"
 HAAR_FEATURE_TYPE_IV    = "IV"
 HAAR_FEATURE_TYPE_V     = "V"
 
+# the default policy of Haar feature catalog, see @CatalogPolicy
+# step of the start point of features
+CATALOG_STRIDE   = 1
+# minimum and maximum width/height of a single rectangle (None: no limit)
+CATALOG_MIN_SIZE = 1
+CATALOG_MAX_SIZE = None
+# enabled feature types
+CATALOG_TYPES    = (HAAR_FEATURE_TYPE_I,
+                    HAAR_FEATURE_TYPE_II,
+                    HAAR_FEATURE_TYPE_III,
+                    HAAR_FEATURE_TYPE_IV,
+                    HAAR_FEATURE_TYPE_V)
+
 AB_TH       = -3.
 OVER_LAP_TH = 0.1
 
@@ -97,3 +181,9 @@ SEARCH_WIN_STEP = 4
 DETECT_START = 1.
 DETECT_END   = 2.
 DETECT_STEP  = 0.2
+
+# shrink the input image of detection while decoding it, see loadForDetection
+# the longest side of the image (None: no limitation)
+DETECT_MAX_SIDE = None
+# the smallest face (pixel) we care about (None: no limitation)
+DETECT_MIN_FACE = None
@@ -0,0 +1,199 @@
+"""
+File        :   dataset.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Packed binary format of the training set.
+
+    Opening the ~14000 tiny BMP files of the training set costs minutes.
+@packDataset decodes them once and writes all of them into a single
+file, which @PackedDataset opens with numpy.memmap: there is nothing to
+decode and the pixels are handed out as zero-copy views.
+
+    Layout of the file:
+
+        magic           8 bytes, b"EFACEPK1"
+        header length   uint64, little endian
+        header          JSON: version, count, height, width, offsets,
+                        source file names and the content hash
+        labels          int8[count]            (64 bytes aligned)
+        pixels          uint8[count, height, width]  (64 bytes aligned)
+
+    python ./dataset.py     packs @TRAINING_FACE and @TRAINING_NONFACE
+                            into @TRAINING_PACK
+"""
+
+from config import LABEL_POSITIVE
+from config import LABEL_NEGATIVE
+
+from matplotlib import image
+
+import hashlib
+import json
+import os
+import struct
+
+import numpy
+
+PACK_MAGIC   = b"EFACEPK1"
+PACK_VERSION = 1
+PACK_ALIGN   = 64
+
+
+def _align(offset):
+    return (offset + PACK_ALIGN - 1) // PACK_ALIGN * PACK_ALIGN
+
+
+def _contentHash(labels, pixels, names):
+    sha = hashlib.sha1()
+    sha.update(numpy.ascontiguousarray(labels).tobytes())
+    sha.update(numpy.ascontiguousarray(pixels).tobytes())
+    sha.update("\n".join(names).encode("utf-8"))
+    return sha.hexdigest()
+
+
+def _readPixels(fileName):
+    img = image.imread(fileName)
+
+    if len(img.shape) == 3:
+        img = img[:,:, 1]
+
+    if img.dtype != numpy.uint8:
+        raise ValueError(fileName + " is not an 8 bit image")
+
+    return img
+
+
+def packDataset(filename, sources):
+    """
+        Decode the images and write them into the packed file @filename.
+
+    @sources    :   A list of (directory, label, sampleNum). The first
+                    @sampleNum images (sorted by file name, None means
+                    all) of every directory are packed in this order.
+
+    Return the content hash of the packed data.
+    """
+    names, labels, pixels = [], [], []
+
+    for (imgDir, label, sampleNum) in sources:
+        fileList = sorted(os.listdir(imgDir))
+        if sampleNum is not None:
+            fileList = fileList[:sampleNum]
+
+        for fileName in fileList:
+            names.append(os.path.join(imgDir, fileName))
+            labels.append(label)
+            pixels.append(_readPixels(os.path.join(imgDir, fileName)))
+
+    labels = numpy.array(labels, dtype = numpy.int8)
+    pixels = numpy.array(pixels, dtype = numpy.uint8)
+
+    count, height, width = pixels.shape
+
+    contentHash = _contentHash(labels, pixels, names)
+
+    header = {"version" : PACK_VERSION,
+              "count"   : count,
+              "height"  : height,
+              "width"   : width,
+              "names"   : names,
+              "hash"    : contentHash}
+
+    # the offsets are in the header, so the header length is fixed first
+    header["labels_offset"] = 0
+    header["pixels_offset"] = 0
+    headerSize = len(json.dumps(header)) + 64
+
+    labelsOffset = _align(len(PACK_MAGIC) + 8 + headerSize)
+    pixelsOffset = _align(labelsOffset + labels.nbytes)
+
+    header["labels_offset"] = labelsOffset
+    header["pixels_offset"] = pixelsOffset
+    headerBytes = json.dumps(header).encode("utf-8").ljust(headerSize)
+
+    tmpName = filename + "." + str(os.getpid()) + ".tmp"
+    with open(tmpName, "wb") as fileObj:
+        fileObj.write(PACK_MAGIC)
+        fileObj.write(struct.pack("<Q", headerSize))
+        fileObj.write(headerBytes)
+
+        fileObj.seek(labelsOffset)
+        fileObj.write(labels.tobytes())
+
+        fileObj.seek(pixelsOffset)
+        fileObj.write(pixels.tobytes())
+
+    os.replace(tmpName, filename)
+
+    return contentHash
+
+
+class PackedDataset:
+    """
+        A packed training set opened by numpy.memmap.
+
+        @names      source file name of every image
+        @labels     int8 array of labels
+        @pixels     uint8 array (count, height, width)
+        @hash       content hash written by @packDataset"""
+
+    def __init__(self, filename, verify = False):
+        with open(filename, "rb") as fileObj:
+            if fileObj.read(len(PACK_MAGIC)) != PACK_MAGIC:
+                raise ValueError(filename + " is not a packed dataset")
+
+            (headerSize,) = struct.unpack("<Q", fileObj.read(8))
+            header = json.loads(fileObj.read(headerSize).decode("utf-8"))
+
+        if header["version"] != PACK_VERSION:
+            raise ValueError(filename + " is packed by version " +
+                             str(header["version"]) + ", repack it")
+
+        self.filename = filename
+        self.count    = header["count"]
+        self.height   = header["height"]
+        self.width    = header["width"]
+        self.names    = header["names"]
+        self.hash     = header["hash"]
+
+        # plain ndarray views of the mapped file, no copy
+        self.labels = numpy.asarray(numpy.memmap(filename, dtype = numpy.int8, mode = "r",
+                                                 offset = header["labels_offset"],
+                                                 shape  = (self.count,)))
+        self.pixels = numpy.asarray(numpy.memmap(filename, dtype = numpy.uint8, mode = "r",
+                                                 offset = header["pixels_offset"],
+                                                 shape  = (self.count, self.height, self.width)))
+
+        if verify and _contentHash(self.labels, self.pixels, self.names) != self.hash:
+            raise ValueError(filename + " is corrupted, content hash mismatch")
+
+
+    def select(self, label):
+        """
+            The indices of the images with @label. It's a slice (so the
+        pixels are still a view) when they are stored together, which is
+        how @packDataset writes them.
+        """
+        idx = numpy.flatnonzero(self.labels == label)
+
+        if idx.size == 0:
+            return slice(0, 0)
+        if idx[-1] - idx[0] + 1 == idx.size:
+            return slice(int(idx[0]), int(idx[-1]) + 1)
+        return idx
+
+
+if __name__ == "__main__":
+    from config import TRAINING_FACE
+    from config import TRAINING_NONFACE
+    from config import TRAINING_PACK
+
+    os.makedirs(os.path.dirname(TRAINING_PACK) or ".", exist_ok = True)
+
+    contentHash = packDataset(TRAINING_PACK,
+                              [(TRAINING_FACE,    LABEL_POSITIVE, None),
+                               (TRAINING_NONFACE, LABEL_NEGATIVE, None)])
+
+    print("Packed into", TRAINING_PACK, "hash:", contentHash)
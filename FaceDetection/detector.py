@@ -7,15 +7,11 @@ Date        :   2016.01.18
 
 from config         import TRAINING_IMG_WIDTH
 from config         import TRAINING_IMG_HEIGHT
-from config         import HAAR_FEATURE_TYPE_I
-from config         import HAAR_FEATURE_TYPE_II
-from config         import HAAR_FEATURE_TYPE_III
-from config         import HAAR_FEATURE_TYPE_IV
 from config         import AB_TH
 from config         import SEARCH_WIN_STEP
 
-from image          import Image
 from haarFeature    import Feature
+from haarFeature    import RECTANGLES
 from matplotlib     import pyplot
 from adaboost       import getCachedAdaBoost
 import pylab
@@ -29,9 +25,54 @@ class Detector:
         pass
 
 
-    def scanImgAtScale(self, model, image, scale):
+    def integralImages(self, image):
+        """
+            The integral image and the squared integral image of @image.
+        Both of them have a leading zero row and column, so the sum of
+        the rectangle (x, y, w, h) is
+
+            ii[y+h, x+w] - ii[y, x+w] - ii[y+h, x] + ii[y, x]
+        """
+        img = numpy.asarray(image, dtype = numpy.float64)
+
+        ImgHeight, ImgWidth = img.shape
+
+        ii  = numpy.zeros((ImgHeight + 1, ImgWidth + 1), dtype = numpy.float64)
+        ii2 = numpy.zeros((ImgHeight + 1, ImgWidth + 1), dtype = numpy.float64)
+
+        ii [1:, 1:] = img.cumsum(axis = 0).cumsum(axis = 1)
+        ii2[1:, 1:] = (img * img).cumsum(axis = 0).cumsum(axis = 1)
+
+        return ii, ii2
+
+
+    def _rectSums(self, ii, x, y, w, h):
+        # @x and @y are arrays, one rectangle for each window
+        return ii[y + h, x + w] - ii[y, x + w] - ii[y + h, x] + ii[y, x]
+
+
+    def scanImgAtScale(self, model, image, scale, integrals = None):
+        """
+            Scan @image with the search window of the size @scale times
+        of the training images.
+
+        @integrals  :   (ii, ii2) returned by @integralImages(image). They
+                        are computed here if it's None.
+
+            A window isn't normalized pixel by pixel like the training
+        images. Its mean and standard deviation come from @integrals
+        with four lookups each, and a feature of the normalized window is
+
+            (feature - mean * sum(sign * area) / featureSize) / std
+
+        where the feature is computed from @integrals as well.
+        """
         assert isinstance(image, numpy.ndarray)
 
+        if integrals is None:
+            integrals = self.integralImages(image)
+        ii, ii2 = integrals
+
         ImgHeight, ImgWidth = image.shape
 
         SEARCH_WIN_WIDTH  = int(TRAINING_IMG_WIDTH  * scale)
@@ -40,68 +81,63 @@ class Detector:
         height    = ImgHeight - SEARCH_WIN_HEIGHT - 10
         step      = SEARCH_WIN_WIDTH/SEARCH_WIN_STEP
         subWinNum = (width/step + 1) * (height/step + 1)
-        #print('subWinNum=', subWinNum) # 1746.3296398891966
-        subImages = numpy.zeros(int(subWinNum), dtype = object)
-        subWins   = numpy.zeros(int(subWinNum), dtype = object)
-
-        idx = 0
-        #print('step=', step)
-        #print('subImages=', len(subImages))
-        #print('width=', width) # 204
-        for x in range(0, int(width), int(step)):
-            #print(x)
-            for y in range(0, int(height), int(step)):
-                #print(y)
-                #print(idx)
-                subWins[idx]   = (x, y, SEARCH_WIN_WIDTH, SEARCH_WIN_HEIGHT)
-                subImages[idx] = Image(Mat = image[y:y+SEARCH_WIN_HEIGHT, x:x+SEARCH_WIN_WIDTH])
-                idx += 1
-                if idx == int(subWinNum):
-                    print('break 1')
-                    break
-            if idx == int(subWinNum):
-                print('break 2')
-                break
-        assert idx <= subWinNum
-
-        subImgNum = idx
-
-        selFeatures = numpy.zeros(model.N, dtype=object)
-
-        haar_scaled = Feature(SEARCH_WIN_WIDTH,   SEARCH_WIN_HEIGHT)
-        haar_train  = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
-
-        for n in range(model.N):
-            selFeatures[n] = haar_train.features[ model.G[n].opt_dimension ] + tuple([model.G[n].opt_dimension])
-
-        mat = numpy.zeros((haar_train.featuresNum, subImgNum), dtype=numpy.float16)
-
-        for feature in selFeatures:
-            (types, x, y, w, h, dim) = feature
+
+        if width <= 0 or height <= 0:
+            return []
+
+        xs = numpy.arange(0, int(width),  int(step))
+        ys = numpy.arange(0, int(height), int(step))
+
+        # x major order, the same as the windows were enumerated before
+        winX = numpy.repeat(xs, ys.size)[:int(subWinNum)]
+        winY = numpy.tile(ys, xs.size)[:int(subWinNum)]
+
+        subImgNum = winX.size
+
+        area = SEARCH_WIN_WIDTH * SEARCH_WIN_HEIGHT
+        mean = self._rectSums(ii,  winX, winY, SEARCH_WIN_WIDTH, SEARCH_WIN_HEIGHT) / area
+        var  = self._rectSums(ii2, winX, winY, SEARCH_WIN_WIDTH, SEARCH_WIN_HEIGHT) / area - mean ** 2
+        std  = numpy.sqrt(numpy.maximum(var, 0.))
+        std[std == 0] = 1.
+
+        haar_train  = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT, model.policy)
+
+        # the stumps as arrays, see compactModel.py
+        compact = model.compact(catalog = True)
+
+        # compact matrix, row k holds the feature dims[k]
+        dims = compact.selectedFeatures()
+        rows = compact.remapDimensions(dims)
+
+        mat = numpy.zeros((dims.size, subImgNum), dtype=numpy.float32)
+
+        for n in range(len(compact)):
+            (types, x, y, w, h) = haar_train.features[ compact.dimension[n] ]
 
             x = int(x * scale)
             y = int(y * scale)
             w = int(w * scale)
             h = int(h * scale)
 
-            for i in range(subImgNum):
-                if   types == HAAR_FEATURE_TYPE_I:
-                    mat[dim][i] = haar_scaled.VecFeatureTypeI(subImages[i].vecImg, x, y, w, h)
-                elif types == HAAR_FEATURE_TYPE_II:
-                    mat[dim][i] = haar_scaled.VecFeatureTypeII(subImages[i].vecImg, x, y, w, h)
-                elif types == HAAR_FEATURE_TYPE_III:
-                    mat[dim][i] = haar_scaled.VecFeatureTypeIII(subImages[i].vecImg, x, y, w, h)
-                elif types == HAAR_FEATURE_TYPE_IV:
-                    mat[dim][i] = haar_scaled.VecFeatureTypeIV(subImages[i].vecImg, x, y, w, h)
+            rects       = RECTANGLES[types]
+            featureSize = w * h * len(rects)
 
-        output = model.grade(mat)
+            feature = numpy.zeros(subImgNum, dtype = numpy.float64)
+            for (dx, dy, sign) in rects:
+                feature += sign * self._rectSums(ii, winX + x + dx * w, winY + y + dy * h, w, h)
+            feature /= featureSize
+
+            # non-zero for the features whose rectangles are not balanced
+            meanWeight = sum(sign for (dx, dy, sign) in rects) * w * h / featureSize
+
+            mat[rows[n]] = (feature - mean * meanWeight) / std
+
+        output = compact.grade(mat, rows)
 
         rectangle = []
         for i in range(len(output)):
             if output[i] > AB_TH:
-                candidate = numpy.array(subWins[i])
-                x, y, w, h = candidate
-                rectangle.append((x, y, w, h, output[i]))
+                rectangle.append((winX[i], winY[i], SEARCH_WIN_WIDTH, SEARCH_WIN_HEIGHT, output[i]))
 
         return rectangle
 
@@ -119,8 +155,10 @@ class Detector:
 
         rectangles = []
 
+        integrals = self.integralImages(image)
+
         for scale in numpy.arange(DETECT_START , DETECT_END, DETECT_STEP):
-            rectangles += self.scanImgAtScale(model, image, scale)
+            rectangles += self.scanImgAtScale(model, image, scale, integrals)
 
         return self.optimalRectangle(rectangles)
 
@@ -183,6 +221,18 @@ class Detector:
         return reducedRectangels
 
 
+    def mapRectangles(self, rectangles, scale):
+        """
+            Map the rectangles found in a shrunk image back to the
+        original image. @scale is (scaleX, scaleY) returned by
+        @image.loadForDetection.
+        """
+        scaleX, scaleY = scale
+
+        return [(int(x * scaleX), int(y * scaleY), int(w * scaleX), int(h * scaleY), score)
+                for (x, y, w, h, score) in rectangles]
+
+
     def pointInRectangle(self, point, rectangle):
         m, n = point
         x, y, w, h, _ = rectangle
@@ -0,0 +1,337 @@
+"""
+File        :   featureCache.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Incremental feature cache for a growing training set.
+
+    The features of an image only depend on its pixels and the Haar
+catalog, so the columns of the feature matrix are cached by the content
+hash of the image. When images are added to the training set, only
+their columns are computed and appended. The training matrix is then
+assembled from the cached columns. The columns of images which are not
+used anymore are kept (another subset, e.g. of a benchmark, may need
+them) until @FeatureCache.prune drops them.
+
+    Layout of the cache directory:
+
+        index.json      catalog version, policy, image size, the
+                        hashes of the columns of every shard, and the
+                        hash of every known image file
+        shard_<k>.npy   float32 (featureNum, number of columns), the
+                        columns computed together
+
+    The whole cache is dropped when the catalog version, the policy or
+the image size changes.
+
+    An image is decoded and hashed only when it's not known yet. A file
+of a directory is known by its path, size and modification time, an
+image of a packed dataset (see dataset.py) by the content hash in the
+pack header and its position. So a run whose columns are all cached
+decodes no image at all.
+
+    A matrix assembled from the cache (or computed from such a matrix)
+is stamped (see haarFeature.writeStamp) with the cache header and the
+hashes of its columns, see @FeatureCache.stamp. It's reused only while
+the stamp matches.
+"""
+
+from config import FEATURE_CHUNK_SIZE
+from config import FEATURE_BLOCK_SIZE
+from config import PROCESS_NUM
+
+from haarFeature import CATALOG_VERSION
+from haarFeature import FeatureStore
+from haarFeature import loadFeatureMat
+from haarFeature import writeStamp
+from haarFeature import isStamped
+from parallelFeature import extractFeatures
+
+import hashlib
+import json
+import os
+
+import numpy
+
+CACHE_VERSION = 1
+
+
+def imageHash(pixels):
+    """
+        The content hash of an image (the raw pixels, before normalizing).
+    """
+    pixels = numpy.ascontiguousarray(pixels)
+
+    sha = hashlib.sha1()
+    sha.update((str(pixels.dtype) + str(pixels.shape)).encode("utf-8"))
+    sha.update(pixels.tobytes())
+    return sha.hexdigest()
+
+
+class FeatureCache:
+    """
+        Parameter:
+        @directory  :   Where the cache lives, created if missing.
+        @haar       :   The Feature object which computes the columns.
+                        Its catalog policy is part of the cache key."""
+
+    def __init__(self, directory, haar):
+        self.directory = directory
+        self.haar      = haar
+
+        os.makedirs(directory, exist_ok = True)
+
+        self.header = {"version"    : CACHE_VERSION,
+                       "catalog"    : CATALOG_VERSION,
+                       "policy"     : haar.policy.key(),
+                       "size"       : [haar.img_Width, haar.img_Height],
+                       "featureNum" : haar.featuresNum}
+
+        self.shards    = {}
+        self.nextShard = 0
+        # file key (see @_fileKeys) -> content hash
+        self.files     = {}
+
+        index = self._readIndex()
+        if index is not None and \
+           all(index.get(key) == value for key, value in self.header.items()):
+            self.shards    = {int(k) : hashes for k, hashes in index["shards"].items()}
+            self.nextShard = index["nextShard"]
+            self.files     = index.get("files", {})
+        else:
+            # computed with another catalog, nothing can be reused
+            for fileName in os.listdir(directory):
+                if fileName.startswith("shard_"):
+                    os.remove(os.path.join(directory, fileName))
+
+        # hash -> (shard, column)
+        self.location = {}
+        for shard, hashes in self.shards.items():
+            for col, h in enumerate(hashes):
+                self.location[h] = (shard, col)
+
+
+    def _indexName(self):
+        return os.path.join(self.directory, "index.json")
+
+
+    def _shardName(self, shard):
+        return os.path.join(self.directory, "shard_" + str(shard) + ".npy")
+
+
+    def _readIndex(self):
+        if not os.path.isfile(self._indexName()):
+            return None
+        with open(self._indexName()) as fileObj:
+            return json.load(fileObj)
+
+
+    def _writeIndex(self):
+        index = dict(self.header)
+        index["shards"]    = {str(k) : hashes for k, hashes in self.shards.items()}
+        index["nextShard"] = self.nextShard
+        # only the files whose columns are still cached
+        index["files"]     = {key : h for key, h in self.files.items() if h in self.location}
+
+        tmpName = self._indexName() + "." + str(os.getpid()) + ".tmp"
+        with open(tmpName, "w") as fileObj:
+            json.dump(index, fileObj)
+        os.replace(tmpName, self._indexName())
+
+
+    def _addShard(self, hashes):
+        shard = self.nextShard
+        self.nextShard += 1
+
+        self.shards[shard] = hashes
+        for col, h in enumerate(hashes):
+            self.location[h] = (shard, col)
+
+        return shard
+
+
+    def _fileKeys(self, imageSet):
+        """
+            A key of every image of @imageSet which is cheap to compute
+        and changes with its content."""
+        if imageSet.pixels is not None:
+            from dataset import PackedDataset
+
+            prefix = "pack " + PackedDataset(imageSet.imgDir).hash + " " + \
+                     str(imageSet.label) + " "
+            return [prefix + str(i) for i in range(imageSet.sampleNum)]
+
+        keys = []
+        for name in imageSet.fileList[:imageSet.sampleNum]:
+            path = os.path.abspath(imageSet.imgDir + name)
+            stat = os.stat(path)
+            keys.append("file " + path + " " + str(stat.st_size) + " " + str(stat.st_mtime_ns))
+        return keys
+
+
+    def _hashes(self, imageSet, chunkSize):
+        keys    = self._fileKeys(imageSet)
+        unknown = [i for i, key in enumerate(keys) if key not in self.files]
+
+        if imageSet.pixels is not None:
+            for i in unknown:
+                self.files[keys[i]] = imageHash(imageSet.pixels[i])
+
+        elif len(unknown) == len(keys):
+            # decoded by chunks in the background, see ImageSet.iterChunks
+            i = 0
+            for images in imageSet.iterChunks(chunkSize):
+                for img in images:
+                    self.files[keys[i]] = imageHash(img.img)
+                    i += 1
+        else:
+            for i in unknown:
+                self.files[keys[i]] = imageHash(imageSet.readImg(i).img)
+
+        return [self.files[key] for key in keys]
+
+
+    def update(self, imageSets, chunkSize = FEATURE_CHUNK_SIZE, processNum = PROCESS_NUM):
+        """
+            Compute and append the columns of the images in @imageSets
+        which are not cached yet. The new columns are computed by
+        @processNum processes into a new shard, see parallelFeature.py.
+        No cached column is dropped, see @prune.
+
+        Return the hashes of all images of @imageSets in order.
+        """
+        hashes = []
+        # (index of the set, index of the image) of the new images
+        new, newHashes = [], []
+
+        for s, imageSet in enumerate(imageSets):
+            for i, h in enumerate(self._hashes(imageSet, chunkSize)):
+                hashes.append(h)
+
+                if h not in self.location:
+                    new.append((s, i))
+                    newHashes.append(h)
+                    # a duplicated image is computed only once
+                    self.location[h] = None
+
+        if len(new) > 0:
+            shard   = self.nextShard
+            # renamed when complete, an interrupted run leaves no shard
+            tmpName = self._shardName(shard) + "." + str(os.getpid()) + ".tmp.npy"
+
+            columns = numpy.lib.format.open_memmap(tmpName, mode = "w+",
+                                                   dtype = numpy.float32,
+                                                   shape = (self.haar.featuresNum, len(new)))
+            extractFeatures(self.haar, imageSets, columns, new, processNum)
+            columns.flush()
+            del columns
+
+            os.replace(tmpName, self._shardName(shard))
+            self._addShard(newHashes)
+
+        print("Feature cache:", len(new), "images computed,",
+              len(hashes) - len(new), "reused")
+
+        self._writeIndex()
+
+        return hashes
+
+
+    def prune(self, hashes):
+        """
+            Drop the cached columns of all images but @hashes, e.g. the
+        result of @update for the current training set. The shards with
+        dropped columns are rewritten.
+        """
+        self._drop(set(hashes))
+        self._writeIndex()
+
+
+    def _drop(self, keep, blockSize = FEATURE_BLOCK_SIZE):
+        for shard in list(self.shards.keys()):
+            hashes = self.shards[shard]
+            live   = [col for col, h in enumerate(hashes) if h in keep]
+
+            if len(live) == len(hashes):
+                continue
+
+            for h in hashes:
+                if self.location.get(h, (None, None))[0] == shard:
+                    del self.location[h]
+
+            del self.shards[shard]
+
+            if len(live) > 0:
+                # a new shard with the live columns, the old one is removed
+                old = numpy.load(self._shardName(shard), mmap_mode = "r")
+                new = numpy.lib.format.open_memmap(
+                          self._shardName(self._addShard([hashes[col] for col in live])),
+                          mode = "w+", dtype = numpy.float32, shape = (old.shape[0], len(live)))
+
+                for start in range(0, old.shape[0], blockSize):
+                    new[start:start + blockSize] = old[start:start + blockSize][:, live]
+
+                new.flush()
+                del old, new
+
+            os.remove(self._shardName(shard))
+
+
+    def assemble(self, hashes, out, blockSize = FEATURE_BLOCK_SIZE):
+        """
+            Write the cached columns of @hashes into @out in order, e.g.
+        the matrix of a FeatureStore. @blockSize feature rows are copied
+        at a time.
+        """
+        assert out.shape == (self.haar.featuresNum, len(hashes))
+
+        byShard = {}
+        for pos, h in enumerate(hashes):
+            shard, col = self.location[h]
+            byShard.setdefault(shard, ([], []))
+            byShard[shard][0].append(pos)
+            byShard[shard][1].append(col)
+
+        for shard, (pos, cols) in byShard.items():
+            shardMat = numpy.load(self._shardName(shard), mmap_mode = "r")
+
+            for start in range(0, out.shape[0], blockSize):
+                block = numpy.asarray(shardMat[start:start + blockSize])
+                out[start:start + blockSize, pos] = block[:, cols]
+
+
+    def stamp(self, hashes):
+        """
+            The stamp of a matrix whose columns are the images @hashes,
+        the cache header (catalog, policy, image size) then the hashes."""
+        return ["cache " + json.dumps(self.header, sort_keys = True)] + list(hashes)
+
+
+    def trainingMat(self, filename, imageSets, chunkSize = FEATURE_CHUNK_SIZE, hashes = None):
+        """
+            The feature matrix of @imageSets, assembled into the feature
+        file @filename (see FeatureStore). It's stamped (see @stamp), and
+        the file is reused as it is when neither the images nor the
+        catalog have changed.
+
+        @hashes :   The result of @update(imageSets), if it's already
+                    called.
+
+        Return the matrix memory mapped read only.
+        """
+        if hashes is None:
+            hashes = self.update(imageSets, chunkSize)
+
+        stamp = self.stamp(hashes)
+
+        if isStamped(filename, stamp):
+            return loadFeatureMat(filename, self.haar.policy, mmap_mode = "r")
+
+        store = FeatureStore(filename, self.haar.featuresNum, len(hashes), self.haar.policy)
+        self.assemble(hashes, store.mat)
+        mat = store.close()
+
+        writeStamp(filename, stamp)
+
+        return mat
@@ -0,0 +1,119 @@
+"""
+File        :   featureSampler.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Matrix-free training of AdaBoost.
+
+    The feature matrix (featuresNum, sampleNum) is the biggest thing in
+the training, while the integral images of the samples are only
+(sampleNum, 361). A FeatureSampler keeps only the integral images and
+stands for the feature matrix:
+
+    @sample(m)      the features tried in the m-th round of boosting, a
+                    random or a cyclic subset of @roundFeatures features
+    @features(dims) the rows @dims, computed on the fly
+    sampler[dim]    one row, computed once and remembered. AdaBoost
+                    reads the rows of the selected features like this.
+
+    Pass it to AdaBoost instead of the feature matrix. Every round then
+only looks at @roundFeatures features, which is much faster, and the best
+stump among them is usually nearly as good as the best of all.
+"""
+
+from config import FEATURE_CHUNK_SIZE
+
+from image import vecImgStack
+
+import numpy
+
+SCHEDULES = ("random", "cyclic")
+
+
+class FeatureSampler:
+    """
+        Parameter:
+        @haar       :   The Feature object whose catalog is sampled.
+        @vecImgs    :   The @Image.vecImg of every sample, a matrix
+                        (number of samples, img_Width * img_Height).
+        @roundFeatures:
+                        Number of features tried in each round.
+        @schedule   :   "random", a new random subset every round, or
+                        "cyclic", consecutive slices of one random
+                        permutation, so every feature is tried once in
+                        featuresNum / roundFeatures rounds.
+        @seed       :   Seed of the random generator."""
+
+    def __init__(self, haar, vecImgs, roundFeatures, schedule = "random", seed = 0):
+        assert schedule in SCHEDULES
+        assert vecImgs.shape[1] == haar.tot_pixels
+
+        self.haar     = haar
+        self.vecImgs  = vecImgs
+        self.schedule = schedule
+
+        self.roundFeatures = min(roundFeatures, haar.featuresNum)
+
+        self.shape = (haar.featuresNum, vecImgs.shape[0])
+
+        self._random = numpy.random.RandomState(seed)
+        self._order  = self._random.permutation(haar.featuresNum)
+
+        # rows of the selected features
+        self._rows = {}
+
+
+    @staticmethod
+    def fromImageSets(haar, imageSets, roundFeatures, schedule = "random", seed = 0,
+                      chunkSize = FEATURE_CHUNK_SIZE):
+        """
+            A FeatureSampler of all images in @imageSets, streaming
+        through them chunk by chunk. Only their integral images are kept.
+        """
+        vecImgs = []
+        for imageSet in imageSets:
+            if imageSet.pixels is not None:
+                pixels = imageSet.pixels[:imageSet.sampleNum]
+                for start in range(0, len(pixels), chunkSize):
+                    vecImgs.append(vecImgStack(pixels[start:start + chunkSize]))
+            else:
+                for images in imageSet.iterChunks(chunkSize):
+                    vecImgs.append(numpy.array([img.vecImg for img in images]))
+
+        return FeatureSampler(haar, numpy.vstack(vecImgs), roundFeatures, schedule, seed)
+
+
+    def sample(self, m):
+        """
+            The sorted features tried in the m-th round."""
+        featuresNum = self.shape[0]
+
+        if self.schedule == "random":
+            dims = self._random.choice(featuresNum, self.roundFeatures, replace = False)
+        else:
+            start = (m * self.roundFeatures) % featuresNum
+            dims  = numpy.take(self._order, range(start, start + self.roundFeatures),
+                               mode = "wrap")
+
+        return numpy.sort(dims)
+
+
+    def features(self, dims, samples = None):
+        """
+            The rows @dims of the feature matrix, (len(dims), number of
+        samples). If @samples is not None, only these columns."""
+        if samples is None:
+            return self.haar.calSelectedFeatures(dims, self.vecImgs)
+        return self.haar.calSelectedFeatures(dims, self.vecImgs[samples])
+
+
+    def __getitem__(self, dim):
+        if numpy.ndim(dim) > 0:
+            # the rows of a list of features, e.g. CompactModel.grade
+            return numpy.array([self[d] for d in numpy.asarray(dim).tolist()])
+
+        dim = int(dim)
+        if dim not in self._rows:
+            self._rows[dim] = self.features([dim])[0]
+        return self._rows[dim]
@@ -0,0 +1,150 @@
+"""
+File        :   featureSelection.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Pre-select the Haar features before boosting.
+
+    Most of the features are highly correlated with each other or hardly
+separate faces from non-faces, but every round of AdaBoost still scans
+all of them. @selectFeatures ranks the features of the cached feature
+matrix by Fisher score and keeps the best @featureNum ones which are
+not redundant (the absolute correlation with every kept feature is less
+than @maxCorrelation).
+
+    The reduced matrix is saved together with the index map into the
+original catalog. Pass that index map to AdaBoost as @featureIndex, so
+the saved model still references the global feature dimensions.
+"""
+
+from config import LABEL_POSITIVE
+from config import LABEL_NEGATIVE
+from config import FEATURE_BLOCK_SIZE
+from config import PRESELECT_MAX_CORRELATION
+
+from haarFeature import saveFeatureMat
+from haarFeature import loadFeatureMat
+
+import numpy
+
+# number of candidates checked together for redundancy
+CANDIDATE_BLOCK = 256
+
+
+def fisherScore(mat, label, blockSize = FEATURE_BLOCK_SIZE):
+    """
+        The Fisher score of every feature (row of @mat):
+            (miuPos - miuNeg)^2 / (varPos + varNeg)
+    It's computed block by block, so @mat may be a memory mapped array.
+    """
+    featureNum = mat.shape[0]
+
+    pos = (label == LABEL_POSITIVE)
+    neg = (label == LABEL_NEGATIVE)
+
+    score = numpy.zeros(featureNum, dtype = numpy.float64)
+
+    for start in range(0, featureNum, blockSize):
+        end   = min(start + blockSize, featureNum)
+        block = numpy.asarray(mat[start:end], dtype = numpy.float64)
+
+        miuPos = block[:, pos].mean(axis = 1)
+        miuNeg = block[:, neg].mean(axis = 1)
+        varPos = block[:, pos].var(axis = 1)
+        varNeg = block[:, neg].var(axis = 1)
+
+        spread = varPos + varNeg
+        spread[spread == 0] = numpy.inf
+
+        score[start:end] = (miuPos - miuNeg) ** 2 / spread
+
+    return score
+
+
+def _standardize(rows):
+    rows = numpy.asarray(rows, dtype = numpy.float32)
+
+    std = rows.std(axis = 1, keepdims = True)
+    std[std == 0] = 1.
+
+    return (rows - rows.mean(axis = 1, keepdims = True)) / std
+
+
+def selectFeatures(mat, label, featureNum, maxCorrelation = PRESELECT_MAX_CORRELATION):
+    """
+        Select @featureNum discriminative and non-redundant features.
+
+    @mat            :   The feature matrix (number of features, number of
+                        samples).
+    @label          :   The label of every sample.
+    @featureNum     :   How many features to keep.
+    @maxCorrelation :   A feature is dropped if the absolute correlation
+                        between it and any kept feature is not less than
+                        this value. 1.0 disables the redundancy check.
+
+    Return the sorted indices of the selected features.
+    """
+    totFeatures, sampleNum = mat.shape
+    featureNum = min(featureNum, totFeatures)
+
+    order = numpy.argsort(-fisherScore(mat, label), kind = "stable")
+
+    kept  = []
+    # standardized rows of the kept features
+    keptZ = numpy.zeros((featureNum, sampleNum), dtype = numpy.float32)
+
+    for start in range(0, totFeatures, CANDIDATE_BLOCK):
+        if len(kept) == featureNum:
+            break
+
+        candidates = order[start:start + CANDIDATE_BLOCK]
+
+        # sorted indices read a memory mapped matrix sequentially
+        sortedPos = numpy.argsort(candidates)
+        z = numpy.empty((candidates.size, sampleNum), dtype = numpy.float32)
+        z[sortedPos] = _standardize(mat[candidates[sortedPos]])
+
+        if len(kept) > 0 and maxCorrelation < 1.:
+            corr = numpy.abs(z.dot(keptZ[:len(kept)].T)) / sampleNum
+            ok   = corr.max(axis = 1) < maxCorrelation
+        else:
+            ok   = numpy.ones(candidates.size, dtype = bool)
+
+        inBlock = numpy.abs(z.dot(z.T)) / sampleNum
+        accepted = []
+        for i in range(candidates.size):
+            if len(kept) == featureNum:
+                break
+            if not ok[i]:
+                continue
+            if len(accepted) > 0 and maxCorrelation < 1. and \
+               inBlock[i, accepted].max() >= maxCorrelation:
+                continue
+
+            accepted.append(i)
+            keptZ[len(kept)] = z[i]
+            kept.append(candidates[i])
+
+    return numpy.sort(numpy.array(kept, dtype = numpy.int64))
+
+
+def saveSelection(filename, mat, index, policy):
+    """
+        Save the reduced feature matrix @mat, which holds the rows @index
+    of the full feature matrix, into @filename.
+    """
+    saveFeatureMat(filename, mat, policy)
+    numpy.save(filename + ".index", index)
+
+
+def loadSelection(filename, policy):
+    """
+        Return (reduced feature matrix, index map) saved by @saveSelection.
+    """
+    mat   = loadFeatureMat(filename, policy)
+    index = numpy.load(filename + ".index.npy")
+
+    assert mat.shape[0] == index.size
+
+    return mat, index
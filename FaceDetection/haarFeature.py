@@ -43,67 +43,647 @@ Description:
     For each feature pattern, the start point(x, y) is at 
     the most left-up pixel in that window. The size of that
     window is @width * @height
+
+    Every feature is a linear function of the integral image, so the
+    whole catalog can be written as a sparse coefficient matrix of
+    size (number of features, number of pixels). @calFeatureForImgs
+    uses it to compute the features of many images with one sparse
+    matrix product instead of a Python loop over every feature.
 """
 import numpy
+from scipy import sparse
 
 from config import HAAR_FEATURE_TYPE_I
 from config import HAAR_FEATURE_TYPE_II
 from config import HAAR_FEATURE_TYPE_III
 from config import HAAR_FEATURE_TYPE_IV
 from config import HAAR_FEATURE_TYPE_V
+from config import FEATURE_CHUNK_SIZE
+from config import CATALOG_FILE
 
 from image import Image
+from image import vecImgStack
 import math
+import os
+import threading
+
+
+"""
+    The rectangles of each feature type. Every entry is
+(dx, dy, sign): the rectangle starts at (x + dx * width, y + dy * height)
+and its sum is added to the feature with @sign. It is the same layout
+as the @VecFeatureType* functions below.
+"""
+RECTANGLES = {HAAR_FEATURE_TYPE_I   : ((0, 0, +1), (0, 1, -1)),
+              HAAR_FEATURE_TYPE_II  : ((1, 0, +1), (0, 0, -1)),
+              HAAR_FEATURE_TYPE_III : ((1, 0, +1), (0, 0, -1), (2, 0, -1)),
+              HAAR_FEATURE_TYPE_IV  : ((0, 1, +1), (0, 0, -1), (0, 2, -1)),
+              HAAR_FEATURE_TYPE_V   : ((1, 0, +1), (0, 0, -1),
+                                       (0, 1, +1), (1, 1, -1))}
+
+
+"""
+    The compiled catalog is saved into @CATALOG_FILE. Increase this
+number whenever the enumeration of features or the layout of the
+saved arrays is changed, so that the stale files are rebuilt.
+"""
+CATALOG_VERSION = 2
+
+FEATURE_TYPES = (HAAR_FEATURE_TYPE_I,
+                 HAAR_FEATURE_TYPE_II,
+                 HAAR_FEATURE_TYPE_III,
+                 HAAR_FEATURE_TYPE_IV,
+                 HAAR_FEATURE_TYPE_V)
+
+# compiled catalogs of this process, indexed by (width, height, policy)
+_catalogs     = {}
+_catalogsLock = threading.Lock()
+
+
+class CatalogPolicy:
+    """
+        How densely the Haar features are enumerated.
+
+        @stride     step of the start point (x, y) of features
+        @minSize    minimum width and height of a single rectangle
+        @maxSize    maximum width and height of a single rectangle,
+                    None means no limitation
+        @types      the enabled feature types
+
+    The default policy (see config.py) enumerates every position and
+    size, which gives 37862 features for a 19 * 19 window. The policy is
+    written into the feature cache and the model file, see @key."""
+
+    def __init__(self, stride = 1, minSize = 1, maxSize = None, types = FEATURE_TYPES):
+        assert stride >= 1 and minSize >= 1
+        assert maxSize is None or maxSize >= minSize
+
+        for t in types:
+            if t not in FEATURE_TYPES:
+                raise ValueError("unknown feature type " + str(t))
+
+        self.stride  = int(stride)
+        self.minSize = int(minSize)
+        self.maxSize = None if maxSize is None else int(maxSize)
+        # keep the order of @FEATURE_TYPES
+        self.types   = tuple(t for t in FEATURE_TYPES if t in types)
+
+
+    @staticmethod
+    def default():
+        from config import CATALOG_STRIDE
+        from config import CATALOG_MIN_SIZE
+        from config import CATALOG_MAX_SIZE
+        from config import CATALOG_TYPES
+
+        return CatalogPolicy(CATALOG_STRIDE, CATALOG_MIN_SIZE,
+                             CATALOG_MAX_SIZE, CATALOG_TYPES)
+
+
+    def acceptSize(self, w, h):
+        if w < self.minSize or h < self.minSize:
+            return False
+        if self.maxSize is not None and (w > self.maxSize or h > self.maxSize):
+            return False
+        return True
+
+
+    def key(self):
+        """
+            A string which identifies this policy, like
+        "stride=1,min=1,max=0,types=I+II+III+IV+V" (max=0 means no limit)."""
+
+        return ("stride=" + str(self.stride) +
+                ",min="   + str(self.minSize) +
+                ",max="   + str(self.maxSize or 0) +
+                ",types=" + "+".join(self.types))
+
+
+    @staticmethod
+    def fromKey(key):
+        fields = dict(item.split("=") for item in key.strip().split(","))
+
+        return CatalogPolicy(stride  = int(fields["stride"]),
+                             minSize = int(fields["min"]),
+                             maxSize = int(fields["max"]) or None,
+                             types   = fields["types"].split("+"))
+
+
+    def __eq__(self, other):
+        return isinstance(other, CatalogPolicy) and self.key() == other.key()
+
+    def __ne__(self, other):
+        return not self.__eq__(other)
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __str__(self):
+        return self.key()
+
+
+def _evalFeatures_total(win_Width, win_Height, policy):
+
+    height_Limit = {HAAR_FEATURE_TYPE_I    : win_Height/2 - 1,
+                     HAAR_FEATURE_TYPE_II  : win_Height   - 1,
+                     HAAR_FEATURE_TYPE_III : win_Height   - 1,
+                     HAAR_FEATURE_TYPE_IV  : win_Height/3 - 1,
+                     HAAR_FEATURE_TYPE_V   : win_Height/2 - 1}
+
+    width_Limit  = {HAAR_FEATURE_TYPE_I   : win_Width   - 1,
+                    HAAR_FEATURE_TYPE_II  : win_Width/2 - 1,
+                    HAAR_FEATURE_TYPE_III : win_Width/3 - 1,
+                    HAAR_FEATURE_TYPE_IV  : win_Width   - 1,
+                    HAAR_FEATURE_TYPE_V   : win_Width/2 - 1}
+
+    features = []
+    for types in policy.types:
+        for w in range(1, math.floor(width_Limit[types])):
+            for h in range(1, math.floor(height_Limit[types])):
+
+                if w == 1 and h == 1:
+                    continue
+
+                if not policy.acceptSize(w, h):
+                    continue
+
+                if types == HAAR_FEATURE_TYPE_I:
+
+                    x_limit = win_Width  - w
+                    y_limit = win_Height - 2*h
+                    for x in range(1, x_limit, policy.stride):
+                        for y in range(1, y_limit, policy.stride):
+                            features.append( (types, x, y, w, h))
+
+                elif types == HAAR_FEATURE_TYPE_II:
+                    x_limit = win_Width  - 2*w
+                    y_limit = win_Height - h
+                    for x in range(1, x_limit, policy.stride):
+                        for y in range(1, y_limit, policy.stride):
+                            features.append( (types, x, y, w, h))
+
+                elif types == HAAR_FEATURE_TYPE_III:
+                    x_limit = win_Width  - 3*w
+                    y_limit = win_Height - h
+                    for x in range(1, x_limit, policy.stride):
+                        for y in range(1, y_limit, policy.stride):
+                            features.append( (types, x, y, w, h))
+
+
+                elif types == HAAR_FEATURE_TYPE_IV:
+                    x_limit = win_Width  - w
+                    y_limit = win_Height - 3*h
+                    for x in range(1, x_limit, policy.stride):
+                        for y in range(1, y_limit, policy.stride):
+                            features.append( (types, x, y, w, h))
+
+                elif types == HAAR_FEATURE_TYPE_V:
+                    x_limit = win_Width  - 2*w
+                    y_limit = win_Height - 2*h
+                    for x in range(1, x_limit, policy.stride):
+                        for y in range(1, y_limit, policy.stride):
+                            features.append( (types, x, y, w, h))
+
+    return features
+
+
+class HaarCatalog:
+    """
+        All Haar features of a @width * @height window stored as
+    struct of arrays.
+
+        @types          index of the feature type in @FEATURE_TYPES
+        @x, @y, @w, @h  position and size of each feature
+        @coefMat        sparse (featuresNum, width * height) matrix.
+                        Its column indices are the offsets of the corners
+                        in the integral image (the same order as
+                        @Image.vecImg) and its data are the coefficients.
+
+    A catalog is never modified after it's built (@features and @mirror
+    are computed once on demand), so it can be shared by many threads.
+    Don't construct it directly, use @getCatalog instead."""
+
+    def __init__(self, width, height, policy, types, x, y, w, h, coefMat):
+        self.width  = width
+        self.height = height
+        self.policy = policy
+
+        self.types = types
+        self.x     = x
+        self.y     = y
+        self.w     = w
+        self.h     = h
+
+        self.coefMat = coefMat
+
+        self.featuresNum = types.size
+
+        self._features = None
+        self._mirror   = None
+
+
+    @property
+    def features(self):
+        """A list of tuples (type, x, y, w, h), built on demand."""
+        if self._features is None:
+            self._features = [(FEATURE_TYPES[t], x, y, w, h)
+                              for t, x, y, w, h in zip(self.types.tolist(),
+                                                       self.x.tolist(),
+                                                       self.y.tolist(),
+                                                       self.w.tolist(),
+                                                       self.h.tolist())]
+        return self._features
+
+
+    @property
+    def mirror(self):
+        """
+            The features of the horizontally flipped window.
+        Return (index, sign), two arrays of size featuresNum: feature i
+        of a flipped image is equal to sign[i] * feature index[i] of the
+        original image. The mirror of a feature is in the catalog
+        because the positions are enumerated symmetrically, unless the
+        policy's stride breaks that symmetry.
+        """
+        if self._mirror is None:
+            spanX = numpy.zeros(self.featuresNum, dtype = numpy.int64)
+            signs = numpy.zeros(len(FEATURE_TYPES), dtype = numpy.int8)
+
+            for t in range(len(FEATURE_TYPES)):
+                rects = RECTANGLES[FEATURE_TYPES[t]]
+                cols  = max(dx for (dx, dy, sign) in rects) + 1
+
+                flipped = set((cols - 1 - dx, dy, sign) for (dx, dy, sign) in rects)
+                if flipped == set(rects):
+                    signs[t] = +1
+                else:
+                    assert flipped == set((dx, dy, -sign) for (dx, dy, sign) in rects)
+                    signs[t] = -1
+
+                spanX[self.types == t] = cols
+
+            x = self.width - self.x - spanX * self.w
+
+            keys   = self._keys(self.types, self.x, self.y, self.w, self.h)
+            order  = numpy.argsort(keys)
+            wanted = self._keys(self.types, x, self.y, self.w, self.h)
+            pos    = numpy.searchsorted(keys, wanted, sorter = order)
+            index  = order[numpy.minimum(pos, self.featuresNum - 1)]
+
+            if (keys[index] != wanted).any():
+                raise ValueError("catalog " + self.policy.key() +
+                                 " is not symmetric, no mirror map")
+
+            self._mirror = (index, signs[self.types])
+
+        return self._mirror
+
+
+    def _keys(self, types, x, y, w, h):
+        # a unique integer for each (type, x, y, w, h)
+        W = self.width + 1
+        H = self.height + 1
+        return (((types.astype(numpy.int64) * W + x) * H + y) * W + w) * H + h
+
+
+    @staticmethod
+    def build(width, height, policy):
+        features = _evalFeatures_total(width, height, policy)
+
+        types = numpy.array([FEATURE_TYPES.index(f[0]) for f in features],
+                            dtype = numpy.int8)
+        x, y, w, h = numpy.array([f[1:] for f in features],
+                                 dtype = numpy.int32).reshape(-1, 4).T
+
+        coefMat = HaarCatalog._evalCoefMat(width, height, types, x, y, w, h)
+
+        return HaarCatalog(width, height, policy, types, x, y, w, h, coefMat)
+
+
+    @staticmethod
+    def _evalCoefMat(width, height, types, x, y, w, h):
+        """
+            Build the sparse coefficient matrix of all features.
+        Row i holds the integral image pixels (and their weights) which
+        are needed to compute the feature i. The pixel index is the same
+        as @Image.vecImg (column-major order).
+        """
+        x, y, w, h = (v.astype(numpy.int64) for v in (x, y, w, h))
+
+        rows, cols, vals = [], [], []
+        for t in range(len(FEATURE_TYPES)):
+            idx = numpy.flatnonzero(types == t)
+
+            rects  = RECTANGLES[FEATURE_TYPES[t]]
+            weight = 1. / (w[idx] * h[idx] * len(rects))
+
+            for (dx, dy, sign) in rects:
+                left = x[idx] + dx * w[idx] - 1
+                top  = y[idx] + dy * h[idx] - 1
+                corners = ((left + w[idx], top + h[idx], +sign),
+                           (left + w[idx], top         , -sign),
+                           (left         , top + h[idx], -sign),
+                           (left         , top         , +sign))
+
+                for (cx, cy, s) in corners:
+                    # corners on the border of image contribute nothing
+                    valid = (cx >= 0) & (cy >= 0)
+                    rows.append(idx[valid])
+                    cols.append(cx[valid] * height + cy[valid])
+                    vals.append(s * weight[valid])
+
+        # duplicated (row, col) entries are summed by the constructor
+        return sparse.csr_matrix((numpy.concatenate(vals),
+                                  (numpy.concatenate(rows),
+                                   numpy.concatenate(cols))),
+                                 shape = (types.size, width * height))
+
+
+    def save(self, filename):
+        """
+            Write the catalog into @filename atomically, so that the
+        processes which are reading it never see a half written file.
+        """
+        tmpName = (filename + "." + str(os.getpid()) + "." +
+                   str(threading.get_ident()) + ".tmp")
+
+        with open(tmpName, "wb") as fileObj:
+            numpy.savez(fileObj,
+                        version = CATALOG_VERSION,
+                        size    = (self.width, self.height),
+                        policy  = self.policy.key(),
+                        types   = self.types,
+                        x = self.x, y = self.y, w = self.w, h = self.h,
+                        indptr  = self.coefMat.indptr,
+                        indices = self.coefMat.indices,
+                        data    = self.coefMat.data)
+
+        os.replace(tmpName, filename)
+
+
+    @staticmethod
+    def load(filename, width, height, policy):
+        """
+            Return the catalog saved in @filename, or None if that file
+        was written by another version, for another window size or with
+        another policy.
+        """
+        with numpy.load(filename) as data:
+            if int(data["version"]) != CATALOG_VERSION or \
+               tuple(data["size"]) != (width, height) or \
+               str(data["policy"]) != policy.key():
+                return None
+
+            types = data["types"]
+            coefMat = sparse.csr_matrix((data["data"],
+                                         data["indices"],
+                                         data["indptr"]),
+                                        shape = (types.size, width * height))
+
+            return HaarCatalog(width, height, policy, types,
+                               data["x"], data["y"], data["w"], data["h"],
+                               coefMat)
+
+
+def getCatalog(width, height, policy = None):
+    """
+        Return the compiled Haar feature catalog of a @width * @height
+    window enumerated with @policy (the default policy if it's None).
+    It is memoized for this process and persisted into @CATALOG_FILE,
+    so the features are enumerated only once.
+    """
+    if policy is None:
+        policy = CatalogPolicy.default()
+
+    key = (width, height, policy.key())
+    if key in _catalogs:
+        return _catalogs[key]
+
+    filename = (CATALOG_FILE + "_" + str(width) + "x" + str(height) + "_" +
+                policy.key().replace(",", "_").replace("=", "") + ".npz")
+
+    # the threads which ask for the same catalog wait for the first one
+    with _catalogsLock:
+        if key in _catalogs:
+            return _catalogs[key]
+
+        catalog = None
+        if os.path.isfile(filename):
+            try:
+                catalog = HaarCatalog.load(filename, width, height, policy)
+            except (OSError, ValueError, KeyError):
+                catalog = None
+
+        if catalog is None:
+            catalog = HaarCatalog.build(width, height, policy)
+            try:
+                os.makedirs(os.path.dirname(filename) or ".", exist_ok = True)
+                catalog.save(filename)
+            except OSError:
+                # the cache is just an optimization
+                pass
+
+        _catalogs[key] = catalog
+        return catalog
+
+
+def saveFeatureMat(filename, mat, policy):
+    """
+        Save the feature matrix into @filename + ".npy" and its catalog
+    policy into @filename + ".policy".
+    """
+    numpy.save(filename, mat)
+
+    _saveMatPolicy(filename, policy)
+
+
+def _saveMatPolicy(filename, policy):
+    with open(filename + ".policy", "w") as fileObj:
+        fileObj.write(policy.key() + "\n")
+
+
+def loadFeatureMat(filename, policy, mmap_mode = None):
+    """
+        Load the feature matrix saved by @saveFeatureMat. Raise
+    ValueError if it was computed with a catalog policy other than
+    @policy. The matrix without a policy file is treated as computed
+    with the default policy.
+    """
+    if os.path.isfile(filename + ".policy"):
+        with open(filename + ".policy") as fileObj:
+            cached = CatalogPolicy.fromKey(fileObj.read())
+    else:
+        cached = CatalogPolicy()
+
+    if cached != policy:
+        raise ValueError("feature file " + filename + " was computed with " +
+                         "catalog policy " + cached.key() + ", expected " +
+                         policy.key())
+
+    return numpy.load(filename + ".npy", mmap_mode = mmap_mode)
+
+
+def readStamp(filename):
+    """
+        The stamp of the feature file @filename, a list of lines saved
+    into @filename + ".hashes" by @writeStamp, or None if it has none.
+    The stamp tells which samples (and settings) the matrix was computed
+    from, see featureCache.py.
+    """
+    if not os.path.isfile(filename + ".hashes"):
+        return None
+    with open(filename + ".hashes") as fileObj:
+        return fileObj.read().split("\n")[:-1]
+
+
+def writeStamp(filename, stamp):
+    with open(filename + ".hashes", "w") as fileObj:
+        fileObj.write("\n".join(stamp) + "\n")
+
+
+def isStamped(filename, stamp):
+    """
+        True if the feature file @filename exists and is stamped with
+    @stamp. Any existing file will do when @stamp is None.
+    """
+    if not os.path.isfile(filename + ".npy"):
+        return False
+
+    return stamp is None or readStamp(filename) == stamp
+
+
+class FeatureStore:
+    """
+        A feature matrix (featureNum, sampleNum) of @dtype which lives in
+    a memory mapped .npy file, so it may be much larger than the memory.
+    The columns are written into @mat as the images are processed, e.g.
+
+        store = FeatureStore(filename, haar.featuresNum, sampleNum, haar.policy)
+        haar.calFeatureForImgSets(imageSets, out = store.mat)
+        mat = store.close()
+
+        The matrix is written into a temporary file and renamed to
+    @filename + ".npy" by @close, an interrupted run never leaves a
+    truncated feature file behind.
+    """
+
+    def __init__(self, filename, featureNum, sampleNum, policy, dtype = numpy.float32):
+        self.filename = filename
+        self.policy   = policy
+
+        os.makedirs(os.path.dirname(filename) or ".", exist_ok = True)
+
+        self._tmpName = filename + "." + str(os.getpid()) + ".tmp.npy"
+        self.mat = numpy.lib.format.open_memmap(self._tmpName, mode = "w+",
+                                                dtype = dtype,
+                                                shape = (featureNum, sampleNum))
+
+
+    def close(self):
+        """
+            Flush the matrix to @filename + ".npy" and save its policy.
+        Return the matrix memory mapped read only, see @loadFeatureMat.
+        """
+        self.mat.flush()
+        self.mat = None
+
+        os.replace(self._tmpName, self.filename + ".npy")
+        _saveMatPolicy(self.filename, self.policy)
+
+        return loadFeatureMat(self.filename, self.policy, mmap_mode = "r")
 
 
 class Feature:
-    def __init__(self, img_Width, img_Height):
+    def __init__(self, img_Width, img_Height, policy = None):
 
         self.featureName = "Haar Feature"
 
         self.img_Width  = img_Width
         self.img_Height = img_Height
 
-        self.tot_pixels = img_Width * img_Height
+        if policy is None:
+            policy = CatalogPolicy.default()
+        self.policy = policy
 
-        self.featureTypes = (HAAR_FEATURE_TYPE_I,
-                             HAAR_FEATURE_TYPE_II,
-                             HAAR_FEATURE_TYPE_III,
-                             HAAR_FEATURE_TYPE_IV,
-                             HAAR_FEATURE_TYPE_V)
+        self.tot_pixels = img_Width * img_Height
 
-        self.features    = self._evalFeatures_total()
+        self.featureTypes = FEATURE_TYPES
 
-        self.featuresNum = len(self.features)
+        # compiled lazily, @VecFeatureType* don't need the catalog
+        self._catalog = None
 
         #self.featureMat  =     numpy.zeros((self.tot_pixels, self.featuresNum),
         #                                   dtype=numpy.float16)
 
-        # just for running faster and save RAM. allocate once and use many times.
-        self.vector          = numpy.zeros(self.featuresNum, dtype=numpy.float32)
+        """
+            There is no scratch buffer in this object. Every evaluation
+        allocates its own output, so one Feature (and the catalog shared
+        by all of them) can serve many threads at the same time.
+        """
+
+
+    @property
+    def catalog(self):
+        if self._catalog is None:
+            self._catalog = getCatalog(self.img_Width, self.img_Height,
+                                       self.policy)
+        return self._catalog
+
+    @property
+    def features(self):
+        return self.catalog.features
 
-        self.idxVector_tmp_0 = numpy.zeros(self.tot_pixels, dtype = numpy.int8)
-        self.idxVector_tmp_1 = numpy.zeros(self.tot_pixels, dtype = numpy.int8)
-        self.idxVector_tmp_2 = numpy.zeros(self.tot_pixels, dtype = numpy.int8)
-        self.idxVector_tmp_3 = numpy.zeros(self.tot_pixels, dtype = numpy.int8)
+    @property
+    def featuresNum(self):
+        return self.catalog.featuresNum
+
+    @property
+    def coefMat(self):
+        """sparse (featuresNum, tot_pixels) matrix of the catalog"""
+        return self.catalog.coefMat
+
+
+    def mirrorFeatures(self, mat):
+        """
+            Return the feature matrix of the horizontally flipped images,
+        computed by reindexing the feature matrix @mat of the original
+        images, which's size is (featuresNum, number of images).
+        """
+        index, sign = self.catalog.mirror
+        return mat[index] * sign[:, None]
 
 
     def vecRectSum(self, idxVector, x, y, width, height):
+        """
+            Return the index vector of a rectangle: the dot product of it
+        and an integral image is the sum of that rectangle. If @idxVector
+        is None a new vector is allocated, otherwise it's reset and
+        reused by the caller.
+        """
+        if idxVector is None:
+            idxVector = numpy.zeros(self.tot_pixels, dtype = numpy.int8)
+
         idxVector *= 0 # reset this vector
+        for idx, sign in self._rectCorners(x, y, width, height):
+            idxVector[idx] = sign
+
+        return idxVector
+
+
+    def _rectCorners(self, x, y, width, height):
+        # (index in @vecImg, sign) of the corners of a rectangle
         if x == 0 and y == 0:
-            idxVector[width * height + 2] = +1
+            return ((self.img_Height * (width - 1) + height - 1, +1),)
 
         elif x == 0:
             idx1 = self.img_Height * (    width - 1) + height + y - 1
             idx2 = self.img_Height * (    width - 1) +          y - 1
-            idxVector[idx1] = +1
-            idxVector[idx2] = -1
+            return ((idx1, +1), (idx2, -1))
 
         elif y == 0:
             idx1 = self.img_Height * (x + width - 1) + height - 1
             idx2 = self.img_Height * (x         - 1) + height - 1
-            idxVector[idx1] = +1
-            idxVector[idx2] = -1
+            return ((idx1, +1), (idx2, -1))
         else:
             idx1 = self.img_Height * (x + width - 1) + height + y - 1
             idx2 = self.img_Height * (x + width - 1) +          y - 1
@@ -113,128 +693,175 @@ class Feature:
             assert idx1 < self.tot_pixels and idx2 < self.tot_pixels 
             assert idx3 < self.tot_pixels and idx4 < self.tot_pixels 
 
-            idxVector[idx1] = + 1
-            idxVector[idx2] = - 1
-            idxVector[idx3] = - 1
-            idxVector[idx4] = + 1
+            return ((idx1, +1), (idx2, -1), (idx3, -1), (idx4, +1))
 
-        return idxVector
+
+    def rectSum(self, vecImg, x, y, width, height):
+        """
+            The sum of a rectangle, read from the integral image @vecImg
+        with (at most) four lookups. It's the same as
+        @vecRectSum(None, ...).dot(vecImg) without any buffer, so it is
+        safe to call it from many threads.
+        """
+        total = 0.
+        for idx, sign in self._rectCorners(x, y, width, height):
+            total += sign * vecImg[idx]
+        return total
 
 
     def VecFeatureTypeI(self, vecImg, x, y, width, height):
-        vec1 = self.vecRectSum(self.idxVector_tmp_0, x, y         , width, height)
-        vec2 = self.vecRectSum(self.idxVector_tmp_1, x, y + height, width, height)
+        sum1 = self.rectSum(vecImg, x, y         , width, height)
+        sum2 = self.rectSum(vecImg, x, y + height, width, height)
 
         featureSize = width * height * 2
 
-        return (vec1.dot(vecImg) - vec2.dot(vecImg))/featureSize
+        return (sum1 - sum2)/featureSize
 
 
     def VecFeatureTypeII(self, vecImg, x, y, width, height):
-        vec1 = self.vecRectSum(self.idxVector_tmp_0, x + width, y, width, height)
-        vec2 = self.vecRectSum(self.idxVector_tmp_1, x        , y, width, height)
+        sum1 = self.rectSum(vecImg, x + width, y, width, height)
+        sum2 = self.rectSum(vecImg, x        , y, width, height)
 
         featureSize = width * height * 2
 
-        return (vec1.dot(vecImg) - vec2.dot(vecImg))/featureSize
+        return (sum1 - sum2)/featureSize
 
 
     def VecFeatureTypeIII(self,vecImg, x, y, width, height):
-        vec1 = self.vecRectSum(self.idxVector_tmp_0, x +   width, y, width, height)
-        vec2 = self.vecRectSum(self.idxVector_tmp_1, x          , y, width, height)
-        vec3 = self.vecRectSum(self.idxVector_tmp_2, x + 2*width, y, width, height)
+        sum1 = self.rectSum(vecImg, x +   width, y, width, height)
+        sum2 = self.rectSum(vecImg, x          , y, width, height)
+        sum3 = self.rectSum(vecImg, x + 2*width, y, width, height)
 
         featureSize = width * height * 3
 
-        return (vec1.dot(vecImg) - vec2.dot(vecImg)
-                - vec3.dot(vecImg))/featureSize
+        return (sum1 - sum2 - sum3)/featureSize
 
 
     def VecFeatureTypeIV(self,vecImg, x, y, width, height):
-        vec1 = self.vecRectSum(self.idxVector_tmp_0, x, y +   height, width, height)
-        vec2 = self.vecRectSum(self.idxVector_tmp_1, x, y           , width, height)
-        vec3 = self.vecRectSum(self.idxVector_tmp_2, x, y + 2*height, width, height)
+        sum1 = self.rectSum(vecImg, x, y +   height, width, height)
+        sum2 = self.rectSum(vecImg, x, y           , width, height)
+        sum3 = self.rectSum(vecImg, x, y + 2*height, width, height)
 
         featureSize = width * height * 3
 
-        return (vec1.dot(vecImg) - vec2.dot(vecImg)
-                - vec3.dot(vecImg))/featureSize
+        return (sum1 - sum2 - sum3)/featureSize
 
 
     def VecFeatureTypeV(self, vecImg, x, y, width, height):
-        vec1 = self.vecRectSum(self.idxVector_tmp_0, x + width,          y, width, height)
-        vec2 = self.vecRectSum(self.idxVector_tmp_1, x        ,          y, width, height)
-        vec3 = self.vecRectSum(self.idxVector_tmp_2, x        , y + height, width, height)
-        vec4 = self.vecRectSum(self.idxVector_tmp_3, x + width, y + height, width, height)
+        sum1 = self.rectSum(vecImg, x + width,          y, width, height)
+        sum2 = self.rectSum(vecImg, x        ,          y, width, height)
+        sum3 = self.rectSum(vecImg, x        , y + height, width, height)
+        sum4 = self.rectSum(vecImg, x + width, y + height, width, height)
 
         featureSize = width * height * 4
 
-        return (vec1.dot(vecImg) - vec2.dot(vecImg) +
-                vec3.dot(vecImg) - vec4.dot(vecImg))/featureSize
+        return (sum1 - sum2 + sum3 - sum4)/featureSize
+
+
+    def calFeatureForImgs(self, images, chunkSize = FEATURE_CHUNK_SIZE):
+        """
+            Compute the features of a batch of images.
+
+        @images     :   A list of Image objects, a two dimension array
+                        whose rows are the @vecImg of each image, or a
+                        three dimension array (N, img_Height, img_Width)
+                        of raw pixels, see @image.vecImgStack.
+        @chunkSize  :   Number of images which are stacked together
+                        for one sparse matrix product.
+
+        Return a matrix which's size is (featuresNum, number of images).
+        Column i is the same as @calFeatureForImg(images[i]).
+        """
+        return self._calFeatures(self.coefMat, images, chunkSize)
+
+
+    def calSelectedFeatures(self, dims, images, chunkSize = FEATURE_CHUNK_SIZE):
+        """
+            Compute only the features @dims of a batch of images.
 
+        @dims       :   An array of indices into @self.features. A model
+                        usually needs only a few dozen of them, see
+                        @AdaBoost.selectedFeatures.
+        @images     :   The same as @calFeatureForImgs.
 
-    def _evalFeatures_total(self):
-        win_Height = self.img_Height
-        win_Width  = self.img_Width
+        Return a matrix which's size is (len(dims), number of images).
+        Row k is the same as row dims[k] of @calFeatureForImgs(images).
+        """
+        dims = numpy.asarray(dims, dtype = numpy.int64)
 
-        height_Limit = {HAAR_FEATURE_TYPE_I    : win_Height/2 - 1,
-                         HAAR_FEATURE_TYPE_II  : win_Height   - 1,
-                         HAAR_FEATURE_TYPE_III : win_Height   - 1,
-                         HAAR_FEATURE_TYPE_IV  : win_Height/3 - 1,
-                         HAAR_FEATURE_TYPE_V   : win_Height/2 - 1}
+        return self._calFeatures(self.coefMat[dims], images, chunkSize)
 
-        width_Limit  = {HAAR_FEATURE_TYPE_I   : win_Width   - 1,
-                        HAAR_FEATURE_TYPE_II  : win_Width/2 - 1,
-                        HAAR_FEATURE_TYPE_III : win_Width/3 - 1,
-                        HAAR_FEATURE_TYPE_IV  : win_Width   - 1,
-                        HAAR_FEATURE_TYPE_V   : win_Width/2 - 1}
 
-        features = []
-        for types in self.featureTypes:
-            for w in range(1, math.floor(width_Limit[types])):
-                for h in range(1, math.floor(height_Limit[types])):
+    def calFeatureForImgSets(self, imageSets, dims = None, chunkSize = FEATURE_CHUNK_SIZE,
+                             out = None):
+        """
+            Compute the features of all images in @imageSets, streaming
+        through them chunk by chunk (see @ImageSet.iterChunks). Only
+        @chunkSize decoded images are kept in memory besides the result.
 
-                    if w == 1 and h == 1:
-                        continue
+        @imageSets  :   A list of ImageSet objects. Their columns are
+                        placed one after another.
+        @dims       :   If it's not None, only compute these features,
+                        like @calSelectedFeatures.
+        @out        :   If it's not None, the features are written into
+                        it chunk by chunk instead of a new matrix, e.g.
+                        the memory mapped matrix of a FeatureStore.
 
-                    if types == HAAR_FEATURE_TYPE_I:
+        Return a matrix which's size is (featuresNum or len(dims),
+        total number of images).
+        """
+        if dims is None:
+            coefMat = self.coefMat
+        else:
+            coefMat = self.coefMat[numpy.asarray(dims, dtype = numpy.int64)]
+
+        sampleNum = sum(imageSet.sampleNum for imageSet in imageSets)
+
+        if out is None:
+            mat = numpy.zeros((coefMat.shape[0], sampleNum), dtype = numpy.float32)
+        else:
+            assert out.shape == (coefMat.shape[0], sampleNum)
+            mat = out
+
+        col = 0
+        for imageSet in imageSets:
+            if imageSet.pixels is not None:
+                # packed set, straight from the pixels without Image objects
+                pixels = imageSet.pixels[:imageSet.sampleNum]
+                chunks = (pixels[start:start + chunkSize]
+                          for start in range(0, len(pixels), chunkSize))
+            else:
+                chunks = imageSet.iterChunks(chunkSize)
+
+            for images in chunks:
+                mat[:, col:col + len(images)] = self._calFeatures(coefMat, images, chunkSize)
+                col += len(images)
+
+        assert col == sampleNum
+
+        return mat
 
-                        x_limit = win_Width  - w
-                        y_limit = win_Height - 2*h
-                        for x in range(1, x_limit):
-                            for y in range(1, y_limit):
-                                features.append( (types, x, y, w, h))
 
-                    elif types == HAAR_FEATURE_TYPE_II:
-                        x_limit = win_Width  - 2*w
-                        y_limit = win_Height - h
-                        for x in range(1, x_limit):
-                            for y in range(1, y_limit):
-                                features.append( (types, x, y, w, h))
+    def _calFeatures(self, coefMat, images, chunkSize):
+        sampleNum = len(images)
 
-                    elif types == HAAR_FEATURE_TYPE_III:
-                        x_limit = win_Width  - 3*w
-                        y_limit = win_Height - h
-                        for x in range(1, x_limit):
-                            for y in range(1, y_limit):
-                                features.append( (types, x, y, w, h))
+        mat = numpy.zeros((coefMat.shape[0], sampleNum), dtype = numpy.float32)
 
+        for start in range(0, sampleNum, chunkSize):
+            end = min(start + chunkSize, sampleNum)
 
-                    elif types == HAAR_FEATURE_TYPE_IV:
-                        x_limit = win_Width  - w
-                        y_limit = win_Height - 3*h
-                        for x in range(1, x_limit):
-                            for y in range(1, y_limit):
-                                features.append( (types, x, y, w, h))
+            if isinstance(images, numpy.ndarray) and images.ndim == 3:
+                vecImgs = vecImgStack(images[start:end])
+            elif isinstance(images, numpy.ndarray):
+                vecImgs = images[start:end]
+            else:
+                vecImgs = numpy.array([img.vecImg for img in images[start:end]])
+
+            assert vecImgs.shape[1] == self.tot_pixels
 
-                    elif types == HAAR_FEATURE_TYPE_V:
-                        x_limit = win_Width  - 2*w
-                        y_limit = win_Height - 2*h
-                        for x in range(1, x_limit):
-                            for y in range(1, y_limit):
-                                features.append( (types, x, y, w, h))
+            mat[:, start:end] = coefMat.dot(vecImgs.T)
 
-        return features
+        return mat
 
 
     def calFeatureForImg(self, img):
@@ -243,23 +870,25 @@ class Feature:
         assert img.img.shape[0] == self.img_Height
         assert img.img.shape[1] == self.img_Width
 
+        vector = numpy.zeros(self.featuresNum, dtype=numpy.float32)
+
         for i in range(self.featuresNum):
             type, x, y, w, h = self.features[i]
 
             if   type == HAAR_FEATURE_TYPE_I:
-                self.vector[i] = self.VecFeatureTypeI(img.vecImg, x, y, w, h)
+                vector[i] = self.VecFeatureTypeI(img.vecImg, x, y, w, h)
             elif type == HAAR_FEATURE_TYPE_II:
-                self.vector[i] = self.VecFeatureTypeII(img.vecImg, x, y, w, h)
+                vector[i] = self.VecFeatureTypeII(img.vecImg, x, y, w, h)
             elif type == HAAR_FEATURE_TYPE_III:
-                self.vector[i] = self.VecFeatureTypeIII(img.vecImg, x, y, w, h)
+                vector[i] = self.VecFeatureTypeIII(img.vecImg, x, y, w, h)
             elif type == HAAR_FEATURE_TYPE_IV:
-                self.vector[i] = self.VecFeatureTypeIV(img.vecImg, x, y, w, h)
+                vector[i] = self.VecFeatureTypeIV(img.vecImg, x, y, w, h)
             elif type == HAAR_FEATURE_TYPE_V:
-                self.vector[i] = self.VecFeatureTypeV(img.vecImg, x, y, w, h)
+                vector[i] = self.VecFeatureTypeV(img.vecImg, x, y, w, h)
             else:
                 raise Exception("unknown feature type")
 
-        return self.vector
+        return vector
 
 
     def makeFeaturePic(self, feature):
@@ -322,119 +951,3 @@ class Feature:
 
         pyplot.matshow(image, cmap = "gray")
         pylab.show()
-
-
-    """
-    old version. Don't use this.
-    def _evalFeatures(self):
-        win_Height = self.img_Height
-        win_Width  = self.img_Width
-
-        height_Limit = {HAAR_FEATURE_TYPE_I   : win_Height/2 - 1,
-                        HAAR_FEATURE_TYPE_II  : win_Height   - 1,
-                        HAAR_FEATURE_TYPE_III : win_Height   - 1,
-                        HAAR_FEATURE_TYPE_IV  : win_Height/2 - 1}
-
-        width_Limit  = {HAAR_FEATURE_TYPE_I   : win_Width   - 1,
-                        HAAR_FEATURE_TYPE_II  : win_Width/2 - 1,
-                        HAAR_FEATURE_TYPE_III : win_Width/3 - 1,
-                        HAAR_FEATURE_TYPE_IV  : win_Width/2 - 1}
-
-        features = []
-        for types in self.featureTypes:
-            for w in xrange(1, width_Limit[types]):
-                for h in xrange(1, height_Limit[types]):
-
-                    y_start = None
-
-                    if types == HAAR_FEATURE_TYPE_I:
-                        x_limit = win_Width  - w
-                        y_limit = win_Height - 2*h
-                        for x in xrange(1, x_limit):
-                            for y in xrange(1, y_limit, 2):
-                                features.append( (types, x, y, w, h))
-
-                    elif types == HAAR_FEATURE_TYPE_II:
-                        x_limit = win_Width  - 2*w
-                        y_limit = win_Height - h
-                        for x in xrange(1, x_limit):
-                            if h % 2 == 1:
-                                if x % 2 == 1:
-                                    y_start = 1
-                                else:
-                                    y_start = 2
-                            else:
-                                y_start = 1
-
-                            for y in xrange(y_start, y_limit, 2):
-                                features.append( (types, x, y, w, h))
-
-                    elif types == HAAR_FEATURE_TYPE_III:
-                        x_limit = win_Width  - 3*w
-                        y_limit = win_Height - h
-                        for x in xrange(1, x_limit):
-                            if w == 1:
-                                if h % 2 == 1:
-                                    if (h + 1)/2 % 2 == 1:
-                                        if x % 2 == 1:
-                                            y_start = 1
-                                        else:
-                                            y_start = 2
-                                    else:
-                                        if x % 2 == 1:
-                                            y_start = 2
-                                        else:
-                                            y_start = 1
-                                else:
-                                    if (h/2) % 2 == 1:
-                                        y_start = 2
-                                    else:
-                                        y_start = 1
-                            elif w == 2:
-                                if h % 2 == 1:
-                                    if x % 2 == 1:
-                                        y_start = 2
-                                    else:
-                                        y_start = 1
-                                else:
-                                    y_start = 2
-
-                            elif w == 3:
-                                if h % 2 == 1:
-                                    if (h+1)/2 % 2 == 1:
-                                        if x % 2 == 1:
-                                            y_start = 2
-                                        else:
-                                            y_start = 1
-                                    else:
-                                        if x % 2 == 1:
-                                            y_start = 1
-                                        else:
-                                            y_start = 2
-                                else:
-                                    if (h/2) % 2 == 1:
-                                        y_start = 1
-                                    else:
-                                        y_start = 2
-                            #elif w == 4:
-                            else:
-                                if h % 2 == 1:
-                                    if x % 2 == 1:
-                                        y_start = 1
-                                    else:
-                                        y_start = 2
-                                else:
-                                    y_start = 1
-
-                            for y in xrange(y_start, y_limit, 2):
-                                features.append( (types, x, y, w, h))
-
-                    elif types == HAAR_FEATURE_TYPE_IV:
-                        x_limit = win_Width  - 2*w
-                        y_limit = win_Height - 2*h
-                        for x in xrange(1, x_limit):
-                            for y in xrange(1, y_limit, 2):
-                                features.append( (types, x, y, w, h))
-        return features
-    """
-
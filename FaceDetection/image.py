@@ -10,14 +10,27 @@ Description :
 and read all images in the directory which is given by
 user.
 
+
+    An ImageSet is read from a directory of image files or from a file
+packed by dataset.py, which holds the pixels without any encoding.
+
+    The images of ImageSet are decoded by a pool of threads. A lazy
+ImageSet decodes nothing up front, @iterChunks decodes the images chunk
+by chunk, so the memory is bounded by the chunk size instead of the
+number of images.
 """
 import numpy
 import os
 import pylab
 
+from concurrent.futures import ThreadPoolExecutor
+
 from matplotlib import pyplot
 from matplotlib import image
 
+from config import LOADING_THREAD_NUM
+from config import FEATURE_CHUNK_SIZE
+
 
 class Image:
 
@@ -41,7 +54,10 @@ class Image:
 
         #self.vecImg  = self.iimg.transpose().flatten()
 
-        self.vecImg = Image._integrateImg( Image._normalization(self.img)  ).transpose().flatten()
+        #self.vecImg = Image._integrateImg( Image._normalization(self.img)  ).transpose().flatten()
+
+        # the same values, without the copy of transpose().flatten()
+        self.vecImg = vecImgStack(self.img[numpy.newaxis])[0]
 
 
     @staticmethod
@@ -108,37 +124,218 @@ class Image:
         pylab.show()
 
 
+def loadForDetection(fileName, maxSide = None, minFace = None):
+    """
+        Read a single channel image for detection, shrunk while decoding.
+
+    @maxSide    :   The longest side of the returned image is not larger
+                    than this.
+    @minFace    :   The size (pixel) of the smallest face we care about.
+                    The image is shrunk until such a face just fits the
+                    smallest search window.
+
+    JPEG images are decoded at 1/2, 1/4 or 1/8 of their size directly
+    (draft mode), the others are resized after decoding. Like @Image, the
+    green channel of color images is used.
+
+    Return (image, (scaleX, scaleY)), the scales map the coordinates in
+    the returned image back to the original one (see @Detector.mapRectangles).
+    """
+    from PIL import Image as PILImage
+
+    from config import TRAINING_IMG_WIDTH
+    from config import DETECT_START
+
+    pil = PILImage.open(fileName)
+    width, height = pil.size
+
+    shrink = 1.
+    if maxSide is not None:
+        shrink = max(shrink, max(width, height) / float(maxSide))
+    if minFace is not None:
+        shrink = max(shrink, minFace / (TRAINING_IMG_WIDTH * DETECT_START))
+
+    target = (max(1, int(round(width / shrink))), max(1, int(round(height / shrink))))
+
+    if target != (width, height):
+        # no effect for the formats other than JPEG
+        pil.draft(pil.mode, target)
+
+    if pil.mode != "L":
+        pil = pil.convert("RGB").getchannel("G")
+
+    if pil.size != target:
+        pil = pil.resize(target, PILImage.BILINEAR)
+
+    return numpy.asarray(pil), (width / float(target[0]), height / float(target[1]))
+
+
+def normalizeStack(stack):
+    """
+        @Image._normalization for a stack of images (N, Row, Col) in one
+    vectorized pass. Return the normalized stack as float64.
+    """
+    stack = numpy.asarray(stack)
+    N     = stack.shape[0]
+
+    # statistics of the contiguous rows, the same as image.mean()/std()
+    flat     = stack.reshape(N, -1)
+    meanVal  = flat.mean(axis = 1)
+    stdValue = flat.std(axis = 1)
+    stdValue[stdValue == 0] = 1
+
+    return (stack - meanVal[:, None, None]) / stdValue[:, None, None]
+
+
+def vecImgStack(stack):
+    """
+        The @Image.vecImg of every image in a stack (N, Row, Col).
+
+    Return a (N, Row * Col) matrix, row i is the flattened (column-major)
+    integral image of the normalized image i. It's computed on the
+    transposed view, so no per-image transpose and copy is needed, and it
+    can be passed to @Feature.calFeatureForImgs directly.
+    """
+    stack = numpy.asarray(stack)
+    N, row, col = stack.shape
+
+    iImg = normalizeStack(stack).transpose(0, 2, 1)
+    # the same order of cumsum as @Image._integrateImg
+    iImg = iImg.cumsum(axis = 1).cumsum(axis = 2)
+
+    return iImg.reshape(N, col * row)
+
+
 class ImageSet:
-    def __init__(self, imgDir = None, label = None, sampleNum = None):
+    """
+        Parameter:
+        @imgDir     :   The directory of images, or a packed dataset file
+                        (see dataset.py). From a packed file only the
+                        images with @label are used and their pixels are
+                        views of the memory mapped file.
+        @label      :   The label of all images in this set.
+        @sampleNum  :   Only the first @sampleNum images (sorted by file
+                        name) are used. None means all of them.
+        @lazy       :   If it's True, no image is decoded by the
+                        constructor. Use @iterChunks to stream them, or
+                        @images to decode all of them on demand.
+        @workers    :   Number of decoding threads. None means the
+                        number of CPUs."""
+
+    def __init__(self, imgDir = None, label = None, sampleNum = None, lazy = False,
+                 workers = LOADING_THREAD_NUM):
 
         assert isinstance(imgDir, str)
 
         self.imgDir = imgDir
-        self.fileList = os.listdir(imgDir)
-        self.fileList.sort()
+
+        # pixels of a packed dataset, None for a directory
+        self.pixels = None
+
+        if os.path.isfile(imgDir):
+            from dataset import PackedDataset
+
+            pack = PackedDataset(imgDir)
+            if label is None:
+                sel = slice(0, pack.count)
+            else:
+                sel = pack.select(label)
+
+            self.fileList = numpy.array(pack.names)[sel].tolist()
+            self.pixels   = pack.pixels[sel]
+        else:
+            self.fileList = os.listdir(imgDir)
+            self.fileList.sort()
 
         if sampleNum == None:
             self.sampleNum = len(self.fileList)
         else:
             self.sampleNum = sampleNum
 
+        assert self.sampleNum <= len(self.fileList)
+
+        # @readNextImg goes on with the files after the first @sampleNum
         self.curFileIdx = self.sampleNum
         self.label  = label
 
-        self.images = [None for _ in range(self.sampleNum)]
+        self.workers = workers or os.cpu_count() or 1
+
+        self._images = None
+        if not lazy:
+            self._images = self._loadAll()
+
+
+    @property
+    def images(self):
+        """All images of this set, decoded on the first access if lazy."""
+        if self._images is None:
+            self._images = self._loadAll()
+        return self._images
+
+
+    def __len__(self):
+        return self.sampleNum
+
+
+    def _makeImage(self, i):
+        if self.pixels is not None:
+            return Image(Mat = self.pixels[i], label = self.label)
+        return Image(self.imgDir + self.fileList[i], self.label)
+
+
+    def _loadAll(self):
+        images = [None for _ in range(self.sampleNum)]
 
         processed = -10.
-        for i in range(self.sampleNum):
-            self.images[i] = Image(imgDir + self.fileList[i], label)
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = [pool.submit(self._makeImage, i)
+                       for i in range(self.sampleNum)]
 
-            if i % (self.sampleNum / 10) == 0:
-                processed += 10.
-                print("Loading ", processed, "%")
+            for i in range(self.sampleNum):
+                images[i] = futures[i].result()
+
+                if i % (self.sampleNum / 10) == 0:
+                    processed += 10.
+                    print("Loading ", processed, "%")
 
         print("Loading  100 %\n")
 
+        return images
+
+
+    def iterChunks(self, chunkSize = FEATURE_CHUNK_SIZE):
+        """
+            Yield the images as lists of at most @chunkSize Image objects.
+        While the caller works on a chunk, the next one is decoded in
+        background, so at most two chunks are in memory at the same time.
+        """
+        if self._images is not None:
+            for start in range(0, self.sampleNum, chunkSize):
+                yield self._images[start:start + chunkSize]
+            return
+
+        def submit(pool, start):
+            end = min(start + chunkSize, self.sampleNum)
+            return [pool.submit(self._makeImage, i)
+                    for i in range(start, end)]
+
+        with ThreadPoolExecutor(self.workers) as pool:
+            pending = submit(pool, 0)
+
+            for start in range(0, self.sampleNum, chunkSize):
+                current = pending
+                if start + chunkSize < self.sampleNum:
+                    pending = submit(pool, start + chunkSize)
+
+                yield [future.result() for future in current]
+
+
+    def readImg(self, i):
+        """The i-th image of this set, decoded now and not kept."""
+        return self._makeImage(i)
+
 
     def readNextImg(self):
-        img = Image(self.imgDir + self.fileList[self.curFileIdx], self.label)
+        img = self._makeImage(self.curFileIdx)
         self.curFileIdx += 1
         return img
@@ -0,0 +1,119 @@
+"""
+File        :   parallelFeature.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Compute the features of image sets with a pool of processes.
+
+    The output is a memory mapped .npy matrix (e.g. the matrix of a
+FeatureStore). Every worker opens the same file and writes its columns
+into it directly, so nothing is pickled back to the parent and there is
+no reduce step copying the partial results together.
+
+    The images are handed out in small chunks, a worker takes the next
+chunk as soon as it finishes one, so the slow ones don't hold the
+others back. The workers read the images themselves, only the image
+indices are sent to them.
+
+    It replaces the old mapReduce.py, which wrote one temporary feature
+file per process and merged them element by element.
+"""
+
+from config import PROCESS_NUM
+from config import PARALLEL_CHUNK_SIZE
+
+from haarFeature import Feature
+from haarFeature import CatalogPolicy
+from image       import ImageSet
+
+from multiprocessing import Pool
+
+import os
+import time
+
+import numpy
+
+# state of a worker process, set by @_initWorker
+_worker = {}
+
+
+def _initWorker(sources, width, height, policyKey, outName):
+    _worker["sets"] = [ImageSet(imgDir, label, sampleNum, lazy = True, workers = 1)
+                       for (imgDir, label, sampleNum) in sources]
+    _worker["haar"] = Feature(width, height, CatalogPolicy.fromKey(policyKey))
+    _worker["out"]  = numpy.load(outName, mmap_mode = "r+")
+
+
+def _extract(task):
+    col, samples = task
+
+    sets = _worker["sets"]
+
+    if all(sets[s].pixels is not None for (s, i) in samples):
+        # packed sets, the pixels are stacked without Image objects
+        images = numpy.array([sets[s].pixels[i] for (s, i) in samples])
+    else:
+        images = [sets[s]._makeImage(i) for (s, i) in samples]
+
+    out = _worker["out"]
+    out[:, col:col + len(samples)] = _worker["haar"].calFeatureForImgs(images)
+    out.flush()
+
+    return len(samples)
+
+
+def extractFeatures(haar, imageSets, out, samples = None,
+                    processNum = PROCESS_NUM, chunkSize = PARALLEL_CHUNK_SIZE):
+    """
+        Compute the features of the images of @imageSets into @out.
+
+    @haar       :   The Feature object, its size and catalog policy are
+                    used by the workers.
+    @imageSets  :   A list of ImageSet objects.
+    @out        :   A numpy.memmap of a .npy file (see FeatureStore),
+                    (haar.featuresNum, number of samples).
+    @samples    :   A list of (index of the set, index of the image), the
+                    images whose features are written into the columns of
+                    @out in this order. None means all images of all sets.
+    @processNum :   Number of worker processes. None means the number of
+                    CPUs.
+    @chunkSize  :   Number of images computed by a worker at a time.
+    """
+    if samples is None:
+        samples = [(s, i) for s, imageSet in enumerate(imageSets)
+                          for i in range(imageSet.sampleNum)]
+
+    assert isinstance(out, numpy.memmap)
+    assert out.shape == (haar.featuresNum, len(samples))
+
+    out.flush()
+
+    sources = [(imageSet.imgDir, imageSet.label, imageSet.sampleNum)
+               for imageSet in imageSets]
+    initArgs = (sources, haar.img_Width, haar.img_Height, haar.policy.key(),
+                out.filename)
+
+    tasks = [(col, samples[col:col + chunkSize])
+             for col in range(0, len(samples), chunkSize)]
+
+    processNum = processNum or os.cpu_count() or 1
+    processNum = max(1, min(processNum, len(tasks)))
+
+    start = time.time()
+    print("Computing features of", len(samples), "images with", processNum, "processes")
+
+    if processNum == 1:
+        _initWorker(*initArgs)
+        results = (_extract(task) for task in tasks)
+        done = sum(results)
+        _worker.clear()
+    else:
+        with Pool(processNum, initializer = _initWorker, initargs = initArgs) as pool:
+            done = 0
+            for n in pool.imap_unordered(_extract, tasks):
+                done += n
+
+    assert done == len(samples)
+
+    print("Cost time: ", time.time() - start, " second.")
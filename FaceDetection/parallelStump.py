@@ -0,0 +1,191 @@
+"""
+File        :   parallelStump.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Search the best stump of a round of AdaBoost with a pool of
+processes.
+
+    The features (rows of the feature matrix) are split into shards.
+Every worker searches the shards it gets with a WeakClassifier and
+returns the best stump of each shard as (error, dimension, threshold,
+direction). The results are reduced in the order of the shards, the
+smallest error wins and the smaller dimension wins a tie, which is the
+choice of the serial search. The stump of every feature is computed by
+the same code on the same rows, so the selected stumps are identical
+to the serial run.
+
+    Nothing big is sent to the workers. A feature matrix which is a
+whole memory mapped .npy file is opened by every worker from its file,
+the other matrices (e.g. a slice of a memory mapped one) and the
+presorted order are copied into shared memory once. The weights are in
+shared memory too, updated by AdaBoost before every round.
+"""
+
+from config import STUMP_PROCESS_NUM
+from config import FEATURE_BLOCK_SIZE
+
+from weakClassifier import WeakClassifier
+
+from multiprocessing import Pool
+from multiprocessing import shared_memory
+
+import os
+
+import numpy
+
+# number of shards for every process, more shards balance the load better
+SHARDS_PER_PROCESS = 4
+
+# state of a worker process, set by @_initWorker
+_worker = {}
+
+
+def _isWholeFile(mat):
+    # @mat is a .npy file as numpy.load maps it, not a view of a part
+    # of it, which keeps the filename and offset of the whole file
+    if not isinstance(mat, numpy.memmap) or mat.filename is None:
+        return False
+
+    try:
+        whole = numpy.load(mat.filename, mmap_mode = "r")
+    except (ValueError, OSError):
+        return False
+
+    return mat.shape == whole.shape and mat.dtype == whole.dtype and \
+           mat.strides == whole.strides and mat.offset == whole.offset
+
+
+def _share(mat, buffers):
+    # how a worker opens @mat, see @_attach
+    if _isWholeFile(mat):
+        return ("file", mat.filename)
+
+    shm = shared_memory.SharedMemory(create = True, size = max(mat.nbytes, 1))
+    numpy.ndarray(mat.shape, dtype = mat.dtype, buffer = shm.buf)[...] = mat
+    buffers.append(shm)
+
+    return ("shm", shm.name, mat.shape, mat.dtype.str)
+
+
+def _attach(spec, buffers):
+    if spec[0] == "file":
+        return numpy.load(spec[1], mmap_mode = "r")
+
+    shm = shared_memory.SharedMemory(name = spec[1])
+    buffers.append(shm)
+
+    return numpy.ndarray(spec[2], dtype = numpy.dtype(spec[3]), buffer = shm.buf)
+
+
+def _initWorker(matSpec, orderSpec, weightSpec, label, binNum, blockSize):
+    buffers = []
+
+    _worker["mat"]    = _attach(matSpec, buffers)
+    _worker["order"]  = None if orderSpec is None else _attach(orderSpec, buffers)
+    _worker["weight"] = _attach(weightSpec, buffers)
+    _worker["label"]  = label
+    _worker["binNum"] = binNum
+    _worker["blockSize"] = blockSize
+    # keep the shared memory mapped as long as the worker lives
+    _worker["buffers"] = buffers
+
+
+def _search(task):
+    start, end, samples = task
+
+    order = _worker["order"]
+    if order is not None:
+        order = order[start:end]
+
+    label = _worker["label"]
+    if samples is not None:
+        label = label[samples]
+
+    weaker = WeakClassifier(_worker["mat"][start:end], label,
+                            numpy.array(_worker["weight"][:label.size]),
+                            blockSize = _worker["blockSize"],
+                            order = order, binNum = _worker["binNum"],
+                            samples = samples)
+    weaker.search()
+
+    return (weaker.opt_errorRate, start + weaker.opt_dimension,
+            weaker.opt_threshold, weaker.opt_direction)
+
+
+class StumpPool:
+    """
+        Parameter:
+        @Mat        :   The feature matrix, an array or a numpy.memmap.
+        @Tag        :   The label of every sample.
+        @order      :   @presort(Mat), or None (see WeakClassifier).
+        @binNum     :   The number of bins of a binned @Mat, or None.
+        @processNum :   Number of worker processes. None means the number
+                        of CPUs.
+
+        Use it as a context manager, the pool and the shared memory are
+    released by @close."""
+
+    def __init__(self, Mat, Tag, order = None, binNum = None,
+                 processNum = STUMP_PROCESS_NUM, blockSize = FEATURE_BLOCK_SIZE):
+
+        self.featureNum, self.sampleNum = Mat.shape
+
+        processNum = processNum or os.cpu_count() or 1
+
+        self._buffers = []
+
+        matSpec   = _share(Mat, self._buffers)
+        orderSpec = None if order is None else _share(order, self._buffers)
+
+        weightShm = shared_memory.SharedMemory(create = True, size = self.sampleNum * 8)
+        self._buffers.append(weightShm)
+        self.weight = numpy.ndarray(self.sampleNum, dtype = numpy.float64, buffer = weightShm.buf)
+
+        shardNum   = min(self.featureNum, processNum * SHARDS_PER_PROCESS)
+        bounds     = numpy.linspace(0, self.featureNum, shardNum + 1).astype(int)
+        self.shards = [(int(bounds[i]), int(bounds[i + 1])) for i in range(shardNum)]
+
+        self._pool = Pool(processNum, initializer = _initWorker,
+                          initargs = (matSpec, orderSpec,
+                                      ("shm", weightShm.name, (self.sampleNum,), "<f8"),
+                                      numpy.asarray(Tag), binNum, blockSize))
+
+
+    def search(self, W, samples = None):
+        """
+            The best stump for the weights @W, (errorRate, dimension,
+        threshold, direction), the same as the serial
+        @WeakClassifier.search. If @samples is not None, only these
+        samples are searched and @W are their weights."""
+        self.weight[:len(W)] = W
+
+        tasks = [(start, end, samples) for (start, end) in self.shards]
+
+        best = None
+        # map keeps the order of the shards, the reduction doesn't depend
+        # on which worker finishes first
+        for result in self._pool.map(_search, tasks, chunksize = 1):
+            if best is None or result[0] < best[0]:
+                best = result
+
+        return best
+
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+        self.weight = None
+        for shm in self._buffers:
+            shm.close()
+            shm.unlink()
+        self._buffers = []
+
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,300 @@
+"""
+File        :   quantization.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    Quantized storage of the training feature matrix.
+
+    A decision stump only compares a feature with a threshold, what
+matters is the order of the values. Every feature (row) is mapped
+linearly onto the range of a small type:
+
+        q = round((value - offset) / scale) + qmin
+
+with its own @offset (the minimum of the row) and @scale, so uint8
+keeps 256 levels of every feature in 1/4 of the float32 size. float16
+is stored as it is, with offset 0 and scale 1.
+
+    WeakClassifier is trained on the quantized values directly. The
+mapping is increasing, so a threshold t learned on them is the same
+decision as the float threshold @Quantizer.toFloat(row, t), which is
+what AdaBoost saves into the model file.
+
+    FeatureBins buckets every feature into at most 256 bins of about the
+same number of samples (quantiles) instead. The matrix holds the uint8
+bin indices, and WeakClassifier searches the stumps over the weighted
+histograms of the bins (@WeakClassifier.optimalBinnedStumps), which is
+much cheaper than over the sorted samples. @FeatureBins.toFloat maps a
+threshold between two bins back to the float edge between them.
+"""
+
+from config import FEATURE_BLOCK_SIZE
+
+from haarFeature import FeatureStore
+from haarFeature import loadFeatureMat
+
+import numpy
+
+QUANTIZED_TYPES = {"uint8"   : numpy.uint8,
+                   "int16"   : numpy.int16,
+                   "float16" : numpy.float16}
+
+
+class Quantizer:
+    """
+        The per feature mapping of a quantized feature matrix.
+
+        @dtype      name of the quantized type, a key of QUANTIZED_TYPES
+        @offset     float64 array, the offset of every row
+        @scale      float64 array, the scale of every row"""
+
+    def __init__(self, dtype, offset, scale):
+        assert dtype in QUANTIZED_TYPES
+        assert offset.shape == scale.shape
+
+        self.dtype  = dtype
+        self.offset = offset
+        self.scale  = scale
+
+        qtype = QUANTIZED_TYPES[dtype]
+        if numpy.issubdtype(qtype, numpy.integer):
+            self.qmin = int(numpy.iinfo(qtype).min)
+            self.qmax = int(numpy.iinfo(qtype).max)
+        else:
+            self.qmin, self.qmax = 0, None
+
+
+    @staticmethod
+    def fit(block, dtype):
+        """
+            The Quantizer of the rows of @block."""
+        block = numpy.asarray(block, dtype = numpy.float64)
+
+        if QUANTIZED_TYPES[dtype] == numpy.float16:
+            return Quantizer(dtype, numpy.zeros(block.shape[0]), numpy.ones(block.shape[0]))
+
+        qtype  = QUANTIZED_TYPES[dtype]
+        levels = float(numpy.iinfo(qtype).max) - numpy.iinfo(qtype).min
+
+        offset = block.min(axis = 1)
+        scale  = (block.max(axis = 1) - offset) / levels
+        # a constant feature, every value is mapped to qmin
+        scale[scale == 0] = 1.
+
+        return Quantizer(dtype, offset, scale)
+
+
+    def quantize(self, block):
+        """
+            Quantize @block, whose rows are the features of this
+        Quantizer."""
+        qtype = QUANTIZED_TYPES[self.dtype]
+
+        if self.qmax is None:
+            return numpy.asarray(block).astype(qtype)
+
+        block = numpy.asarray(block, dtype = numpy.float64)
+        q = numpy.rint((block - self.offset[:, None]) / self.scale[:, None]) + self.qmin
+
+        return numpy.clip(q, self.qmin, self.qmax).astype(qtype)
+
+
+    def dequantize(self, block):
+        return (numpy.asarray(block, dtype = numpy.float64) - self.qmin) * \
+                self.scale[:, None] + self.offset[:, None]
+
+
+    def toFloat(self, row, value):
+        """
+            The float value of the quantized @value of feature @row."""
+        return float((value - self.qmin) * self.scale[row] + self.offset[row])
+
+
+    def take(self, index):
+        """
+            The Quantizer of the rows @index, see featureSelection.py."""
+        return Quantizer(self.dtype, self.offset[index], self.scale[index])
+
+
+    def save(self, filename):
+        numpy.savez(filename + ".quant.npz", dtype = self.dtype,
+                    offset = self.offset, scale = self.scale)
+
+
+    @staticmethod
+    def load(filename):
+        data = numpy.load(filename + ".quant.npz")
+        return Quantizer(str(data["dtype"]), data["offset"], data["scale"])
+
+
+class FeatureBins:
+    """
+        The bins of every feature of a binned feature matrix.
+
+        @edges      float64 array (featureNum, binNum - 1). The bin of a
+                    value is the number of edges not greater than it.
+                    The edges of a feature with less distinct values
+                    than bins are padded with its largest value, so the
+                    padded bins are empty and a split there is the same
+                    as the split at the last real edge."""
+
+    def __init__(self, edges):
+        self.edges  = edges
+        self.binNum = edges.shape[1] + 1
+
+        assert self.binNum <= 256
+
+
+    @staticmethod
+    def fit(block, binNum):
+        """
+            The FeatureBins of the rows of @block, cut at the quantiles.
+        An edge is halfway between two distinct values of the feature,
+        so no sample is on an edge."""
+        block = numpy.sort(numpy.asarray(block, dtype = numpy.float64), axis = 1)
+
+        featureNum, sampleNum = block.shape
+
+        edges = numpy.empty((featureNum, binNum - 1))
+
+        cuts = numpy.arange(1, binNum) * sampleNum // binNum
+
+        for row in range(featureNum):
+            values = block[row]
+
+            upper = numpy.unique(values[cuts])
+            # the largest value less than each cut value
+            lower = numpy.searchsorted(values, upper, side = "left") - 1
+
+            ok = lower >= 0
+            rowEdges = (values[lower[ok]] + upper[ok]) / 2
+
+            edges[row, :rowEdges.size] = rowEdges
+            edges[row, rowEdges.size:] = values[-1]
+
+        return FeatureBins(edges)
+
+
+    def quantize(self, block):
+        """
+            The uint8 bin indices of @block, whose rows are the features
+        of this FeatureBins."""
+        block = numpy.asarray(block)
+        bins  = numpy.zeros(block.shape, dtype = numpy.uint8)
+
+        for row in range(block.shape[0]):
+            bins[row] = numpy.searchsorted(self.edges[row], block[row], side = "right")
+
+        return bins
+
+
+    def toFloat(self, row, value):
+        """
+            The float threshold of the threshold @value (k + 0.5, between
+        the bin k and k + 1) of feature @row."""
+        return float(self.edges[row, int(numpy.floor(value))])
+
+
+    def take(self, index):
+        return FeatureBins(self.edges[index])
+
+
+    def save(self, filename):
+        numpy.save(filename + ".bins.npy", self.edges)
+
+
+    @staticmethod
+    def load(filename):
+        return FeatureBins(numpy.load(filename + ".bins.npy"))
+
+
+def quantizeFeatureMat(filename, mat, dtype, policy, blockSize = FEATURE_BLOCK_SIZE):
+    """
+        Quantize the float feature matrix @mat into @filename + ".npy",
+    @blockSize rows at a time, so @mat may be memory mapped. The
+    Quantizer is saved into @filename + ".quant.npz".
+
+    Return (quantized matrix memory mapped read only, Quantizer).
+    """
+    featureNum, sampleNum = mat.shape
+
+    store  = FeatureStore(filename, featureNum, sampleNum, policy,
+                          dtype = QUANTIZED_TYPES[dtype])
+    offset = numpy.zeros(featureNum, dtype = numpy.float64)
+    scale  = numpy.zeros(featureNum, dtype = numpy.float64)
+
+    for start in range(0, featureNum, blockSize):
+        block = numpy.asarray(mat[start:start + blockSize])
+
+        quantizer = Quantizer.fit(block, dtype)
+        store.mat[start:start + block.shape[0]] = quantizer.quantize(block)
+
+        offset[start:start + block.shape[0]] = quantizer.offset
+        scale [start:start + block.shape[0]] = quantizer.scale
+
+    quantizer = Quantizer(dtype, offset, scale)
+    quantizer.save(filename)
+
+    return store.close(), quantizer
+
+
+def binFeatureMat(filename, mat, binNum, policy, blockSize = FEATURE_BLOCK_SIZE):
+    """
+        Bucket the float feature matrix @mat into at most @binNum bins
+    per feature, like @quantizeFeatureMat. The FeatureBins are saved into
+    @filename + ".bins.npy".
+
+    Return (bin matrix memory mapped read only, FeatureBins).
+    """
+    featureNum, sampleNum = mat.shape
+
+    store = FeatureStore(filename, featureNum, sampleNum, policy, dtype = numpy.uint8)
+    edges = numpy.zeros((featureNum, binNum - 1), dtype = numpy.float64)
+
+    for start in range(0, featureNum, blockSize):
+        block = numpy.asarray(mat[start:start + blockSize])
+
+        bins = FeatureBins.fit(block, binNum)
+        store.mat[start:start + block.shape[0]] = bins.quantize(block)
+
+        edges[start:start + block.shape[0]] = bins.edges
+
+    bins = FeatureBins(edges)
+    bins.save(filename)
+
+    return store.close(), bins
+
+
+def loadBinnedMat(filename, policy, binNum):
+    """
+        Load the matrix saved by @binFeatureMat. Raise ValueError if it
+    has another number of bins than @binNum.
+    """
+    bins = FeatureBins.load(filename)
+
+    if bins.binNum != binNum:
+        raise ValueError("feature file " + filename + " has " + str(bins.binNum) +
+                         " bins, expected " + str(binNum))
+
+    mat = loadFeatureMat(filename, policy, mmap_mode = "r")
+    assert mat.shape[0] == bins.edges.shape[0]
+
+    return mat, bins
+
+
+def loadQuantizedMat(filename, policy, dtype):
+    """
+        Load the matrix saved by @quantizeFeatureMat. Raise ValueError if
+    it's quantized to another type than @dtype.
+    """
+    quantizer = Quantizer.load(filename)
+
+    if quantizer.dtype != dtype:
+        raise ValueError("feature file " + filename + " is quantized to " +
+                         quantizer.dtype + ", expected " + dtype)
+
+    mat = loadFeatureMat(filename, policy, mmap_mode = "r")
+    assert mat.shape[0] == quantizer.offset.size
+
+    return mat, quantizer
@@ -0,0 +1,107 @@
+"""
+File        :   roc.py
+Date        :   2026.10.18
+License     :   MIT License
+
+Description :
+    The exact ROC curve of the scores of a strong classifier.
+
+    A sample is predicted positive when its score is greater than the
+threshold (see AdaBoost.prediction). The rates only change at the
+scores of the samples, so the scores are sorted once and the true and
+false positives above every distinct score are counted with cumulative
+sums. Any threshold is then answered by a binary search, and the
+threshold for an expected tpr is found on the curve directly instead of
+sweeping a grid of thresholds over the samples.
+"""
+
+from config import LABEL_POSITIVE
+
+import numpy
+
+
+class ROC:
+    """
+        Parameter:
+        @score  :   The scores of the samples, e.g. AdaBoost.score, the
+                    scores of a validation set or of a test set
+                    computed by AdaBoost.grade.
+        @label  :   The labels of the samples.
+
+        The points of the curve, from the lowest threshold to the
+    highest:
+
+        @thresholds     below the lowest score, then every distinct score
+        @tprs, @fprs    the rates of predicting positive the samples whose
+                        score is greater than the threshold"""
+
+    def __init__(self, score, label):
+        score    = numpy.asarray(score, dtype = numpy.float64)
+        positive = numpy.asarray(label) == LABEL_POSITIVE
+
+        assert score.shape == positive.shape
+
+        self.posNum = numpy.count_nonzero(positive)
+        self.negNum = positive.size - self.posNum
+
+        # the distinct scores and the samples of each, sorted once
+        self.values, group = numpy.unique(score, return_inverse = True)
+
+        posHist = numpy.bincount(group, weights = positive,  minlength = self.values.size)
+        negHist = numpy.bincount(group, weights = ~positive, minlength = self.values.size)
+
+        # the number of positive (negative) samples not above each score
+        self._posBelow = numpy.concatenate(([0.], numpy.cumsum(posHist)))
+        self._negBelow = numpy.concatenate(([0.], numpy.cumsum(negHist)))
+
+        lowest = self.values[0] - 1. if self.values.size > 0 else 0.
+
+        self.thresholds = numpy.concatenate(([lowest], self.values))
+        self.tprs, self.fprs = self._rates(numpy.arange(self.thresholds.size))
+
+
+    def _rates(self, below):
+        # @below distinct scores are not above the threshold
+        tp = self.posNum - self._posBelow[below]
+        fp = self.negNum - self._negBelow[below]
+
+        return tp / max(self.posNum, 1), fp / max(self.negNum, 1)
+
+
+    def rates(self, th):
+        """
+            The rates (tpr, fpr) at the thresholds @th, a number or an
+        array."""
+        return self._rates(numpy.searchsorted(self.values, th, side = "right"))
+
+
+    def threshold(self, expected_tpr):
+        """
+            The threshold with the lowest fpr whose tpr is at least
+        @expected_tpr.
+
+        Return (threshold, tpr, fpr). Every threshold between two adjacent
+        scores gives the same rates, the one halfway between them is
+        returned, so the rates don't depend on how the scores are rounded.
+        """
+        # the tpr decreases with the threshold
+        k = numpy.flatnonzero(self.tprs >= expected_tpr)[-1]
+
+        th = self.thresholds[k]
+        if k + 1 < self.thresholds.size:
+            th = (th + self.thresholds[k + 1]) / 2
+
+        return numpy.float64(th), self.tprs[k], self.fprs[k]
+
+
+    def save(self, filename):
+        """
+            Append the curve to @filename, a line "tpr fpr threshold"
+        (separated by tab) for every point."""
+        fileObj = open(filename, "a+")
+        for t, f, th in zip(self.tprs.astype(numpy.float16),
+                            self.fprs.astype(numpy.float16), self.thresholds):
+            fileObj.write(str(t) + "\t" + str(f) + "\t" + str(th) + "\n")
+
+        fileObj.flush()
+        fileObj.close()
@@ -13,30 +13,23 @@ from haarFeature import Feature
 
 import numpy
 
-face    = ImageSet(TEST_FACE,    sampleNum = 100)
+face    = ImageSet(TEST_FACE,    sampleNum = 100, lazy = True)
 
-nonFace = ImageSet(TEST_NONFACE, sampleNum = 100)
+nonFace = ImageSet(TEST_NONFACE, sampleNum = 100, lazy = True)
 
 tot_samples = face.sampleNum + nonFace.sampleNum
 
-haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
-
-mat = numpy.zeros((haar.featuresNum, tot_samples))
+model = getCachedAdaBoost(filename = ADABOOST_CACHE_FILE + str(0), limit = 10)
 
-for i in range(face.sampleNum):
-    featureVec = haar.calFeatureForImg(face.images[i])
-    for j in range(haar.featuresNum):
-        mat[j][i                     ]  = featureVec[j]
-        
-for i in range(nonFace.sampleNum):
-    featureVec = haar.calFeatureForImg(nonFace.images[i])
-    for j in range(haar.featuresNum):
-        mat[j][i + face.sampleNum] = featureVec[j]
+# the dimensions of model refer to the catalog it was trained with
+haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT, model.policy)
 
+# only the features used by the model
+dims = model.selectedFeatures()
 
-model = getCachedAdaBoost(filename = ADABOOST_CACHE_FILE + str(0), limit = 10)
+mat = haar.calFeatureForImgSets((face, nonFace), dims)
 
-output = model.prediction(mat, th=0)
+output = model.prediction(mat, th=0, dims=dims)
 
 detectionRate = numpy.count_nonzero(output[0:100] == LABEL_POSITIVE) * 1./ 100
 
@@ -11,75 +11,198 @@ from config   import NEGATIVE_SAMPLE
 from config   import TRAINING_IMG_HEIGHT
 from config   import TRAINING_IMG_WIDTH
 from config   import FEATURE_FILE_TRAINING
-from config   import FEATURE_NUM
 from config   import ADABOOST_LIMIT
 from config   import ADABOOST_CACHE_FILE
 from config   import DEBUG_MODEL
 from config   import TRAINING_FACE
 from config   import TRAINING_NONFACE
+from config   import TRAINING_PACK
+from config   import LABEL_POSITIVE
+from config   import LABEL_NEGATIVE
+from config   import MIRROR_POSITIVE
+from config   import PRESELECT_NUM
+from config   import FEATURE_FILE_SELECTED
+from config   import FEATURE_FILE_QUANTIZED
+from config   import FEATURE_QUANTIZATION
+from config   import FEATURE_FILE_BINNED
+from config   import FEATURE_BINS
+from config   import FEATURE_CACHE_DIR
+from config   import MATRIX_FREE_FEATURES
+from config   import MATRIX_FREE_SCHEDULE
 
 from haarFeature import Feature
+from haarFeature import FeatureStore
+from haarFeature import loadFeatureMat
+from haarFeature import writeStamp
+from haarFeature import isStamped
 from image       import ImageSet
 from adaboost    import AdaBoost
 from adaboost    import getCachedAdaBoost
+from featureSelection import selectFeatures
+from featureSelection import saveSelection
+from featureSelection import loadSelection
+from quantization     import quantizeFeatureMat
+from quantization     import loadQuantizedMat
+from quantization     import binFeatureMat
+from quantization     import loadBinnedMat
+from featureCache     import FeatureCache
+from featureSampler   import FeatureSampler
 
 import os
 import numpy
 
-Face    = ImageSet(TRAINING_FACE,    sampleNum = POSITIVE_SAMPLE)
-nonFace = ImageSet(TRAINING_NONFACE, sampleNum = NEGATIVE_SAMPLE)
+# the packed training set needs no decoding, see dataset.py
+if os.path.isfile(TRAINING_PACK):
+    faceSrc, nonFaceSrc = TRAINING_PACK, TRAINING_PACK
+else:
+    faceSrc, nonFaceSrc = TRAINING_FACE, TRAINING_NONFACE
+
+# decoded only when the features have to be computed
+Face    = ImageSet(faceSrc,    LABEL_POSITIVE, sampleNum = POSITIVE_SAMPLE, lazy = True)
+nonFace = ImageSet(nonFaceSrc, LABEL_NEGATIVE, sampleNum = NEGATIVE_SAMPLE, lazy = True)
 
 tot_samples = Face.sampleNum + nonFace.sampleNum
 
 haar   = Feature(TRAINING_IMG_WIDTH, TRAINING_IMG_HEIGHT)
 
-if os.path.isfile(FEATURE_FILE_TRAINING + ".npy"):
+if FEATURE_QUANTIZATION is not None and FEATURE_BINS > 0:
+    raise ValueError("set only one of FEATURE_QUANTIZATION and FEATURE_BINS")
+
+if (FEATURE_QUANTIZATION is not None or FEATURE_BINS > 0) and MIRROR_POSITIVE is True:
+    raise ValueError("MIRROR_POSITIVE needs float features, " +
+                     "set FEATURE_QUANTIZATION to None and FEATURE_BINS to 0")
+
+quantizer = None
+
+if MATRIX_FREE_FEATURES > 0 and (MIRROR_POSITIVE is True or PRESELECT_NUM > 0 or
+                                 FEATURE_QUANTIZATION is not None or FEATURE_BINS > 0):
+    raise ValueError("matrix-free training works without MIRROR_POSITIVE, " +
+                     "PRESELECT_NUM, FEATURE_QUANTIZATION and FEATURE_BINS")
+
+cache = None
+stamp = None
+
+if FEATURE_CACHE_DIR is not None and MATRIX_FREE_FEATURES == 0:
+    # the images are hashed first, a saved quantized (binned) matrix is
+    # reused only when it's stamped with the same images and catalog
+    cache  = FeatureCache(FEATURE_CACHE_DIR, haar)
+    hashes = cache.update((Face, nonFace))
+    stamp  = cache.stamp(hashes)
+
+quantizedStamp = None if stamp is None else stamp + ["quantization " + str(FEATURE_QUANTIZATION)]
+binnedStamp    = None if stamp is None else stamp + ["bins " + str(FEATURE_BINS)]
+
+# memory mapped, the training reads it by blocks of FEATURE_BLOCK_SIZE rows
+if MATRIX_FREE_FEATURES > 0:
+
+    # no feature matrix at all, only the integral images of the samples
+    _mat = FeatureSampler.fromImageSets(haar, (Face, nonFace), MATRIX_FREE_FEATURES,
+                                        MATRIX_FREE_SCHEDULE)
+
+elif FEATURE_QUANTIZATION is not None and isStamped(FEATURE_FILE_QUANTIZED, quantizedStamp):
+
+    _mat, quantizer = loadQuantizedMat(FEATURE_FILE_QUANTIZED, haar.policy,
+                                       FEATURE_QUANTIZATION)
+
+elif FEATURE_BINS > 0 and isStamped(FEATURE_FILE_BINNED, binnedStamp):
+
+    _mat, quantizer = loadBinnedMat(FEATURE_FILE_BINNED, haar.policy, FEATURE_BINS)
 
-    _mat = numpy.load(FEATURE_FILE_TRAINING + ".npy")
+elif cache is not None:
+
+    _mat = cache.trainingMat(FEATURE_FILE_TRAINING, (Face, nonFace), hashes = hashes)
+
+elif os.path.isfile(FEATURE_FILE_TRAINING + ".npy"):
+
+    _mat = loadFeatureMat(FEATURE_FILE_TRAINING, haar.policy, mmap_mode = "r")
 
 else:
     if DEBUG_MODEL is True:
-        _mat = numpy.zeros((haar.featuresNum, tot_samples))
+        store = FeatureStore(FEATURE_FILE_TRAINING, haar.featuresNum,
+                             tot_samples, haar.policy)
+        haar.calFeatureForImgSets((Face, nonFace), out = store.mat)
 
-        for i in range(Face.sampleNum):
-            featureVec = haar.calFeatureForImg(Face.images[i])
-            for j in range(haar.featuresNum):
-                _mat[j][i] = featureVec[j]
+        _mat = store.close()
+    else:
+        from parallelFeature import extractFeatures
 
-        for i in range(nonFace.sampleNum):
-            featureVec = haar.calFeatureForImg(nonFace.images[i])
-            for j in range(haar.featuresNum):
-                _mat[j][i + Face.sampleNum] = featureVec[j]
+        store = FeatureStore(FEATURE_FILE_TRAINING, haar.featuresNum,
+                             tot_samples, haar.policy)
+        extractFeatures(haar, (Face, nonFace), store.mat)
 
-        numpy.save(FEATURE_FILE_TRAINING, _mat)
-    else:
-        from mapReduce import map
-        from mapReduce import reduce
+        _mat = store.close()
 
-        map(Face, nonFace)
-        _mat = reduce()
+if FEATURE_QUANTIZATION is not None and quantizer is None:
+    _mat, quantizer = quantizeFeatureMat(FEATURE_FILE_QUANTIZED, _mat,
+                                         FEATURE_QUANTIZATION, haar.policy)
+    if quantizedStamp is not None:
+        writeStamp(FEATURE_FILE_QUANTIZED, quantizedStamp)
 
-mat = _mat
+if FEATURE_BINS > 0 and quantizer is None:
+    _mat, quantizer = binFeatureMat(FEATURE_FILE_BINNED, _mat, FEATURE_BINS, haar.policy)
+    if binnedStamp is not None:
+        writeStamp(FEATURE_FILE_BINNED, binnedStamp)
 
 featureNum, sampleNum = _mat.shape
 
 assert sampleNum  == (POSITIVE_SAMPLE + NEGATIVE_SAMPLE)
-assert featureNum == FEATURE_NUM
+assert featureNum == haar.featuresNum
+
+positiveNum = POSITIVE_SAMPLE
 
-Label_Face    = [+1 for i in range(POSITIVE_SAMPLE)]
+if MIRROR_POSITIVE is True:
+    # flipped faces are reindexed from the existing columns, no extraction
+    mirrored = haar.mirrorFeatures(_mat[:, :POSITIVE_SAMPLE])
+    _mat = numpy.hstack((_mat[:, :POSITIVE_SAMPLE], mirrored,
+                         _mat[:, POSITIVE_SAMPLE:]))
+    positiveNum *= 2
+
+Label_Face    = [+1 for i in range(positiveNum)]
 Label_NonFace = [-1 for i in range(NEGATIVE_SAMPLE)]
 
 label = numpy.array(Label_Face + Label_NonFace)
 
+featureIndex = None
+
+if PRESELECT_NUM > 0:
+    # boost over the reduced matrix, the model keeps catalog dimensions.
+    # The selection is reused only for the same samples and features
+    selectionStamp = ["samples "      + str(label.size),
+                      "mirror "       + str(MIRROR_POSITIVE),
+                      "preselect "    + str(PRESELECT_NUM),
+                      "policy "       + haar.policy.key(),
+                      "quantization " + str(FEATURE_QUANTIZATION),
+                      "bins "         + str(FEATURE_BINS)]
+    if stamp is not None:
+        selectionStamp += stamp
+
+    if isStamped(FEATURE_FILE_SELECTED, selectionStamp):
+        selected, featureIndex = loadSelection(FEATURE_FILE_SELECTED, haar.policy)
+    else:
+        featureIndex = selectFeatures(_mat, label, PRESELECT_NUM)
+        selected     = _mat[featureIndex]
+        saveSelection(FEATURE_FILE_SELECTED, selected, featureIndex, haar.policy)
+        writeStamp(FEATURE_FILE_SELECTED, selectionStamp)
+
+    _mat = selected
+    if quantizer is not None:
+        quantizer = quantizer.take(featureIndex)
+
+    assert _mat.shape[1] == label.size
+
+mat = _mat
+
 cache_filename = ADABOOST_CACHE_FILE + str(0)
 
 if os.path.isfile(cache_filename):
     model = getCachedAdaBoost(mat     = _mat,
                               label   = label,
                               filename= cache_filename,
-                              limit   = ADABOOST_LIMIT)
+                              limit   = ADABOOST_LIMIT,
+                              policy  = haar.policy)
 else:
-    model = AdaBoost(mat, label, limit = ADABOOST_LIMIT)
+    model = AdaBoost(mat, label, limit = ADABOOST_LIMIT, policy = haar.policy,
+                     featureIndex = featureIndex, quantizer = quantizer)
     model.train()
     model.saveModel(cache_filename)
 
@@ -10,14 +10,87 @@ License     :   MIT License
 
 from matplotlib import pyplot
 import numpy
+import os
+import tempfile
 
 from config import LABEL_POSITIVE
 from config import LABEL_NEGATIVE
+from config import FEATURE_BLOCK_SIZE
+from config import STUMP_BLOCK_SIZE
+
+
+def _signed(feature):
+    # quantized features (see quantization.py) may be unsigned, they
+    # can't be multiplied by a negative direction
+    if feature.dtype.kind in "ui":
+        return feature.astype(numpy.float32)
+    return feature
+
+
+def presort(mat, blockSize = FEATURE_BLOCK_SIZE):
+    """
+        The samples sorted by every feature (row) of @mat, an int32
+    matrix of the same shape. It's computed once before boosting and
+    passed to every WeakClassifier as @order. For a memory mapped @mat
+    it's memory mapped too, into a temporary file next to @mat which is
+    deleted by @removeOrder.
+    """
+    if isinstance(mat, numpy.memmap):
+        fd, filename = tempfile.mkstemp(suffix = ".order.npy",
+                                        dir = os.path.dirname(os.path.abspath(mat.filename)))
+        os.close(fd)
+        order = numpy.lib.format.open_memmap(filename, mode = "w+", dtype = numpy.int32,
+                                             shape = mat.shape)
+    else:
+        order = numpy.zeros(mat.shape, dtype = numpy.int32)
+
+    for start in range(0, mat.shape[0], blockSize):
+        order[start:start + blockSize] = numpy.argsort(numpy.asarray(mat[start:start + blockSize]),
+                                                       axis = 1, kind = "stable")
+    return order
+
+
+def removeOrder(order):
+    """
+        Delete the temporary file of @order, the result of @presort, if
+    it's memory mapped."""
+    if isinstance(order, numpy.memmap):
+        os.remove(order.filename)
+
+
+def _bestSplits(cumPos, cumNeg, totPos, totNeg, invalid = None):
+    """
+        The best split of every row, from the cumulative weights of the
+    positive and negative samples below each split point. Return
+    (errorRate, index of split point, direction)."""
+
+    rows = numpy.arange(cumPos.shape[0])
+
+    # direction +1 predicts the values below threshold as positive
+    errPlus  = cumNeg + (totPos - cumPos)
+    errMinus = cumPos + (totNeg - cumNeg)
+
+    if invalid is not None:
+        errPlus [invalid] = numpy.inf
+        errMinus[invalid] = numpy.inf
+
+    kPlus  = errPlus.argmin(axis = 1)
+    kMinus = errMinus.argmin(axis = 1)
+
+    # direction -1 wins a tie, it was tried first by the old search
+    useMinus  = errMinus[rows, kMinus] <= errPlus[rows, kPlus]
+    k         = numpy.where(useMinus, kMinus, kPlus)
+    errorRate = numpy.where(useMinus, errMinus[rows, kMinus], errPlus[rows, kPlus])
+    direction = numpy.where(useMinus, -1, 1)
+
+    return errorRate, k, direction
 
 
 class WeakClassifier:
 
-    def __init__(self, Mat = None, Tag = None, W = None, train = True):
+    def __init__(self, Mat = None, Tag = None, W = None, train = True,
+                 blockSize = FEATURE_BLOCK_SIZE, order = None, binNum = None,
+                 samples = None):
         """
         Parameter:
         @Mat    :   A matrix(or two dimension array) which's size is
@@ -31,14 +104,32 @@ class WeakClassifier:
                     number of total sample.
 
         @train  :   A bool value. If it's False, it means that user want to
-                    get a instance of this class object from cached data"""
+                    get a instance of this class object from cached data
+
+        @blockSize: Number of rows of @Mat read into memory together by
+                    @train. @Mat may be a memory mapped matrix (see
+                    haarFeature.FeatureStore), then this is what bounds
+                    the memory used for it.
+
+        @order  :   @presort(Mat), sorted samples of every feature. It's
+                    computed block by block by @train if it's None.
+
+        @binNum :   If it's not None, @Mat holds the bin indices of the
+                    features (see quantization.FeatureBins) and the
+                    stumps are searched over the bins.
+
+        @samples:   If it's not None, only these columns of @Mat (sorted
+                    sample indices) are searched, and @Tag and @W are the
+                    labels and weights of these samples. The columns are
+                    taken from one block of rows at a time, @Mat is never
+                    copied as a whole."""
 
         if train == True:
             """
             It's necessary to do this check.
             The implementation depend on numpy.ndarray heavily
             """
-            assert Mat.__class__ == numpy.ndarray
+            assert isinstance(Mat, numpy.ndarray) # or numpy.memmap
             assert Tag.__class__ == numpy.ndarray
             assert   W.__class__ == numpy.ndarray
 
@@ -61,6 +152,20 @@ class WeakClassifier:
 
             # sampleDim == the number of features
             self.sampleDim, self.sampleNum = self._mat.shape
+            self.blockSize = blockSize
+            self._order    = order
+            self.binNum    = binNum
+
+            self._samples = samples
+            if samples is not None:
+                self.sampleNum = len(samples)
+
+                # the new column of every sample in the subset, -1 if it's
+                # not in it, to filter @order
+                self._column = numpy.full(self._mat.shape[1], -1, dtype = numpy.int32)
+                self._column[samples] = numpy.arange(self.sampleNum, dtype = numpy.int32)
+
+            assert self._label.size == self.sampleNum
 
             if W.any() == None:
                 self.numPos = numpy.count_nonzero(self._label == LABEL_POSITIVE)
@@ -72,7 +177,7 @@ class WeakClassifier:
             else:
                 self.weight = W
 
-            self.output = numpy.zeros(self.sampleNum, dtype = numpy.int)
+            self.output = numpy.zeros(self.sampleNum, dtype = int)
 
             self.opt_errorRate = 1.
             self.opt_dimension = 0
@@ -80,106 +185,153 @@ class WeakClassifier:
             self.opt_direction = 0
             
 
-    def optimal(self, d):
+    def optimalStumps(self, block, order):
+        """
+            The stump of the minimum weighted error of every feature
+        (row) in @block, searched over all thresholds at once.
 
-        # for positive sample
-        idx = (self._label + LABEL_POSITIVE) / (LABEL_POSITIVE * 2)
-        weight = self.weight  * idx
-        vector = self._mat[d] * idx
-        sumPos = weight.dot(vector)
-        sumPosW= weight.sum()
+        @order  :   The samples sorted by every row of @block, see @presort.
 
-        # for negative sample
-        idx = (self._label + LABEL_NEGATIVE) / (LABEL_NEGATIVE * 2)
-        weight = self.weight  * idx
-        vector = self._mat[d] * idx
-        sumNeg = weight.dot(vector)
-        sumNegW= weight.sum()
+            A threshold between the k-th and the (k+1)-th smallest value
+        of a feature predicts the first k + 1 sorted samples as one class
+        and the others as the other class, so its error is read from the
+        cumulative sums of the weights of positive and negative samples
+        in this order. Thresholds can't split equal values.
 
+        Return (errorRate, threshold, direction), arrays of len(block).
         """
-        Code beyong there is just optimal version of this one.
-        ======================================================
-        sumPos = 0.
-        sumNeg = 0.
+        rows = numpy.arange(block.shape[0])
 
-        sumPosW = 0.
-        sumNegW = 0.
+        values = numpy.take_along_axis(block, order, axis = 1).astype(numpy.float64)
 
-        for i in xrange(self.sampleNum):
-            if self._label[i] == LABEL_POSITIVE:
-                sumPos  += self.weight[i] * self._mat[d][i]
-                sumPosW += self.weight[i]
-            else:
-                sumNeg  += self.weight[i] * self._mat[d][i]
-                sumNegW += self.weight[i]
-        """
-                
-        miuPos = sumPos / sumPosW
-        miuNeg = sumNeg / sumNegW
+        isPos  = (self._label == LABEL_POSITIVE)
+        totPos = self.weight[isPos].sum()
+        totNeg = self.weight[~isPos].sum()
 
-        threshold = (miuPos + miuNeg)/2
+        cumPos = numpy.where(isPos, self.weight, 0.)[order].cumsum(axis = 1)[:, :-1]
+        cumNeg = numpy.where(isPos, 0., self.weight)[order].cumsum(axis = 1)[:, :-1]
 
-        minErrRate    = numpy.inf
-        bestDirection = None
-        for direction in [-1, 1]:
-            errorRate = 0.
+        tied = values[:, :-1] == values[:, 1:]
 
-            self.output[self._mat[d] * direction < threshold * direction]\
-                    = LABEL_POSITIVE
+        errorRate, k, direction = _bestSplits(cumPos, cumNeg, totPos, totNeg, tied)
 
-            self.output[self._mat[d] * direction >= threshold * direction]\
-                    = LABEL_NEGATIVE
+        threshold = (values[rows, k] + values[rows, k + 1]) / 2
 
-            errorRate = self.weight[ self.output != self._label].sum()
+        return errorRate, threshold, direction
 
-            """
-            Code beyond there is just optimal version of this one.
-            ======================================================
-
-            self.output *= 0 # reset the output
-            start = time.time()
-            for i in xrange(self.sampleNum):
-                if self._mat[d][i] *direction < threshold * direction:
-                    self.output[i] = LABEL_POSITIVE
-                else:
-                    self.output[i] = LABEL_NEGATIVE
+    def optimalBinnedStumps(self, block):
+        """
+            @optimalStumps for a @block of bin indices (see
+        quantization.FeatureBins). The cumulative sums are taken over
+        the weighted histograms of positive and negative samples in the
+        @binNum bins instead of the sorted samples, and the thresholds
+        are between two bins (k + 0.5). A split with no sample on one
+        side is skipped, like a split between equal values is skipped by
+        @optimalStumps.
+        """
+        featureNum = block.shape[0]
 
-                if self.output[i] != self._label[i]:
-                    errorRate += self.weight[i]
-            """
+        isPos  = (self._label == LABEL_POSITIVE)
+        totPos = self.weight[isPos].sum()
+        totNeg = self.weight[~isPos].sum()
+
+        # one bincount for the histograms of all features, the negative
+        # samples are counted after the positive ones
+        idx = block.astype(numpy.intp) + \
+              (numpy.arange(featureNum) * self.binNum)[:, None] + \
+              numpy.where(isPos, 0, featureNum * self.binNum)
+
+        hist = numpy.bincount(idx.ravel(),
+                              weights   = numpy.broadcast_to(self.weight, block.shape).ravel(),
+                              minlength = 2 * featureNum * self.binNum)
+        hist = hist.reshape(2, featureNum, self.binNum)
+
+        cumPos = hist[0].cumsum(axis = 1)[:, :-1]
+        cumNeg = hist[1].cumsum(axis = 1)[:, :-1]
 
-            self.output *= 0 # reset the output
-            if errorRate < minErrRate:
-                minErrRate    = errorRate
-                bestDirection = direction
+        # the weight below and above every split, exactly 0 when the bins
+        # on that side are empty
+        total   = hist[0] + hist[1]
+        below   = total.cumsum(axis = 1)[:, :-1]
+        above   = total[:, ::-1].cumsum(axis = 1)[:, ::-1][:, 1:]
+        invalid = (below == 0) | (above == 0)
 
-        return minErrRate, threshold, bestDirection
+        errorRate, k, direction = _bestSplits(cumPos, cumNeg, totPos, totNeg, invalid)
+
+        return errorRate, k + 0.5, direction
 
     def train(self):
 
-        for dim in range(self.sampleDim):
-            err, threshold, direction = self.optimal(dim)
-            if err < self.opt_errorRate:
-                self.opt_errorRate = err
-                self.opt_dimension = dim
-                self.opt_threshold = threshold
-                self.opt_direction = direction
+        self.search()
 
         assert self.opt_errorRate < 0.5
 
         return self.opt_errorRate
 
-    def prediction(self, Mat):
-        sampleNum = Mat.shape[1]
+    def search(self):
+        """
+            Search all features for the best stump. @blockSize rows of
+        @Mat are read at a time, and searched STUMP_BLOCK_SIZE rows
+        together by @optimalStumps (@optimalBinnedStumps if the features
+        are binned). The first feature wins a tie.
+
+            Unlike @train, the stump may be useless (error not less than
+        0.5). That's how a worker searches its part of the features, see
+        parallelStump.py."""
+
+        for start in range(0, self.sampleDim, self.blockSize):
+            if self._samples is None:
+                block = numpy.asarray(self._mat[start:start + self.blockSize])
+            else:
+                block = numpy.asarray(self._mat[start:start + self.blockSize])[:, self._samples]
+
+            if self.binNum is not None:
+                order = None
+            elif self._order is None or self.sampleNum * 5 < self._mat.shape[1]:
+                # a small subset is sorted faster than the presorted
+                # samples are filtered, the order is the same
+                order = numpy.argsort(block, axis = 1, kind = "stable")
+            elif self._samples is None:
+                order = numpy.asarray(self._order[start:start + block.shape[0]])
+            else:
+                # the sorted samples of the subset, in the same order.
+                # numpy.compress is much faster than a boolean index here
+                order  = self._column[numpy.asarray(self._order[start:start + block.shape[0]])].ravel()
+                order  = numpy.compress(order >= 0, order).reshape(block.shape)
+
+            for sub in range(0, block.shape[0], STUMP_BLOCK_SIZE):
+                if order is None:
+                    err, threshold, direction = self.optimalBinnedStumps(
+                            block[sub:sub + STUMP_BLOCK_SIZE])
+                else:
+                    err, threshold, direction = self.optimalStumps(
+                            block[sub:sub + STUMP_BLOCK_SIZE], order[sub:sub + STUMP_BLOCK_SIZE])
+
+                best = numpy.argmin(err)
+                if err[best] < self.opt_errorRate:
+                    self.opt_errorRate = float(err[best])
+                    self.opt_dimension = start + sub + int(best)
+                    self.opt_threshold = float(threshold[best])
+                    self.opt_direction = int(direction[best])
 
-        dim       = self.opt_dimension
+        return self.opt_errorRate
+
+    def prediction(self, Mat, dim = None):
+        """
+        @dim    :   The row of @Mat which holds the feature of this
+                    classifier. It's @self.opt_dimension by default, give
+                    it when @Mat only holds a subset of all features."""
+        if dim is None:
+            dim   = self.opt_dimension
         threshold = self.opt_threshold
         direction = self.opt_direction
 
-        output = numpy.zeros(sampleNum, dtype = numpy.int)
+        feature = _signed(Mat[dim])
 
-        output[Mat[dim] * direction <  direction * threshold] = LABEL_POSITIVE
-        output[Mat[dim] * direction >= direction * threshold] = LABEL_NEGATIVE
+        # compared in float64, a python float would be rounded to the
+        # type of @feature
+        output = numpy.where(feature * direction < direction * numpy.float64(threshold),
+                             LABEL_POSITIVE, LABEL_NEGATIVE).astype(int)
         """
         Optimised for this.
         ========================================================